@@ -0,0 +1,81 @@
+from typing import AsyncGenerator, List, Dict, Any, Union
+from langchain_core.messages import BaseMessage
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BaseStageAgent:
+    """
+    Shared invoke/ainvoke/astream of the stage agents.
+    Subclasses set self.agent (create_agent with a ProviderStrategy response format) in __init__.
+    """
+
+    # "state" reported in the structured_response of an error response
+    error_state = "error"
+
+    def invoke(self, messages: Union[List[Dict[str, str]], List[BaseMessage]]) -> Dict[str, Any]:
+        """
+        Invoke the agent and return properly formatted response.
+        Handles errors and ensures proper JSON serialization.
+        """
+        try:
+            response = self.agent.invoke({"messages": messages})
+            return self._format_response(response)
+        except Exception as e:
+            return self._error_response("invoke", e)
+
+    async def ainvoke(self, messages: Union[List[Dict[str, str]], List[BaseMessage]]) -> Dict[str, Any]:
+        """
+        Async variant of invoke; does not block the event loop while the model runs.
+        """
+        try:
+            response = await self.agent.ainvoke({"messages": messages})
+            return self._format_response(response)
+        except Exception as e:
+            return self._error_response("ainvoke", e)
+
+    @staticmethod
+    def _format_response(response: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Handle the structured_response - convert Pydantic model to dict if needed.
+        """
+        if "structured_response" in response:
+            structured_response = response["structured_response"]
+
+            # If it's a Pydantic model, convert to dict
+            if hasattr(structured_response, 'model_dump'):
+                response["structured_response"] = structured_response.model_dump()
+            elif isinstance(structured_response, str):
+                # If it's a string, try to parse as JSON
+                try:
+                    response["structured_response"] = json.loads(structured_response)
+                except json.JSONDecodeError:
+                    # If not valid JSON, wrap it in a dict
+                    response["structured_response"] = {"raw_response": structured_response}
+            elif not isinstance(structured_response, dict):
+                # If it's some other type, convert to dict
+                response["structured_response"] = dict(structured_response) if hasattr(structured_response, '__dict__') else {"raw_response": str(structured_response)}
+
+        return response
+
+    def _error_response(self, method: str, e: Exception) -> Dict[str, Any]:
+        """
+        Log the failure of `method` and return error response in expected format.
+        """
+        logger.error(f"Error in {type(self).__name__}.{method}: {e}", exc_info=True)
+        return {
+            "error": True,
+            "error_message": str(e),
+            "structured_response": {
+                "error": True,
+                "error_message": str(e),
+                "state": self.error_state
+            }
+        }
+
+    async def astream(self, messages: Union[List[Dict[str, str]], List[BaseMessage]], session_id: str) -> AsyncGenerator[Dict[str, Any], Any]:
+        async for chunk in self.agent.astream({"messages": messages}, config = {
+            "thread_id": session_id
+        }):
+            yield chunk
@@ -1,6 +1,7 @@
 import json
+import asyncio
 import logging
-from typing import AsyncGenerator, List, Dict, Any, Union
+from typing import AsyncGenerator, List, Dict, Any, Optional, Union
 
 from langchain.agents import create_agent
 from langchain.agents.structured_output import ProviderStrategy
@@ -164,10 +165,17 @@ class SprintPlannerAgent:
         self,
         idea_context: str,
         week: int,
+        messages: Optional[List[Dict[str, str]]] = None,
     ) -> Dict[str, Any]:
-        
+        """
+        Generate one sprint week, continuing the conversation in `messages`
+        (defaults to the agent's own self.messages).
+        """
+        if messages is None:
+            messages = self.messages
+
         if week == 1:
-            self.messages.append({
+            messages.append({
                 "role": "user",
                 "content": f"""
                    <<< idea context >>>
@@ -176,14 +184,14 @@ class SprintPlannerAgent:
                 """,
             })
             
-        self.messages.append({
+        messages.append({
             "role": "user",
             "content": self._build_week_prompt(week),
         })
 
-        response = self.invoke(self.messages)
+        response = self.invoke(messages)
         
-        self.messages.append({
+        messages.append({
             "role": "assistant",
             "content": str(response["structured_response"]),
         })
@@ -195,10 +203,22 @@ class SprintPlannerAgent:
         idea_context: str,
     ) -> Dict[str, Any]:
         all_weeks: List[Dict[str, Any]] = []
+        # Each plan gets its own conversation, so concurrent plans don't share messages
+        messages: List[Dict[str, str]] = []
         for week in range(1, 5):
             try:
-                all_weeks.append(self.generate_week_sprint(idea_context, week))
+                all_weeks.append(self.generate_week_sprint(idea_context, week, messages))
             except Exception as e:
                 logger.error(f"Error in SprintPlannerAgent.generate_all_weeks_sprint: {e}", exc_info=True)
                 continue
         return SprintPlanningState(sprints=all_weeks)       
+
+    async def agenerate_all_weeks_sprint(
+        self,
+        idea_context: str,
+    ) -> SprintPlanningState:
+        """
+        Async variant of generate_all_weeks_sprint: the blocking agent calls run in a
+        worker thread, so the event loop keeps serving other requests meanwhile.
+        """
+        return await asyncio.to_thread(self.generate_all_weeks_sprint, idea_context)
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Iterable, Optional, List, Dict
+import psycopg
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator, Optional, List, Dict, Tuple
 
+from psycopg import Connection
 from psycopg.rows import dict_row
-from psycopg_pool import ConnectionPool
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 from psycopg.types.json import Json
 
 from src.models.chat_message_model import ChatMessageModel
@@ -15,26 +19,51 @@ class NeonDB:
     """
     Simple Neon Postgres client using psycopg3 connection pool.
 
-    - Uses DATABASE_URL from env (Neon connection string).
+    - Uses NEON_POOLED_DATABASE_URL from env (Neon's -pooler endpoint), falling back to
+      DATABASE_URL; NEON_DIRECT_DATABASE_URL, if set, is only used for schema changes.
     - Closes idle connections after ~4 minutes (max_idle=240),
       so Neon can auto-hibernate after 5 min of inactivity.
+    - Connections are kept alive with TCP keepalives and recycled every hour.
+    - Connections are reused across calls; max_size bounds the concurrent
+      writers when saves are offloaded to worker threads, async_max_size the
+      concurrent queries on the async pool.
+    - Statements run 3 times on a connection are prepared server-side.
     - Provides helpers for chat_messages table.
     """
 
     def __init__(
         self,
         db_url: Optional[str] = None,
+        direct_db_url: Optional[str] = None,
         min_size: int = 1,
-        max_size: int = 5,
+        max_size: int = 10,
+        async_max_size: int = 25,
         acquire_timeout: float = 10.0,
         max_idle_seconds: float = 240.0,  # < 5 min to help Neon hibernate
     ) -> None:
-        self._db_url = db_url or os.getenv("DATABASE_URL")
+        # Runtime queries go through Neon's PgBouncer (-pooler host): no TLS/auth handshake
+        # per new connection and no backend max_connections exhaustion
+        self._db_url = db_url or os.getenv("NEON_POOLED_DATABASE_URL") or os.getenv("DATABASE_URL")
         if not self._db_url:
             raise ValueError(
-                "DATABASE_URL is not set. "
+                "NEON_POOLED_DATABASE_URL / DATABASE_URL is not set. "
                 "Copy the connection string from Neon and put it in the env."
             )
+        # DDL/migrations bypass the pooler when a direct endpoint is configured
+        self._direct_db_url = direct_db_url or os.getenv("NEON_DIRECT_DATABASE_URL")
+
+        connection_kwargs = {
+            "autocommit": True,
+            "row_factory": dict_row,
+            # TCP keepalives detect dropped peers (e.g. after Neon suspends) without waiting for a query
+            "keepalives": 1,
+            "keepalives_idle": 30,
+            "keepalives_interval": 10,
+            "keepalives_count": 3,
+            # The chat queries repeat constantly; prepare them early to skip per-execute parsing
+            "prepare_threshold": 3,
+        }
+        self._connection_kwargs = connection_kwargs
 
         self._pool = ConnectionPool(
             conninfo=self._db_url,
@@ -44,17 +73,98 @@ class NeonDB:
             max_idle=max_idle_seconds,
             max_lifetime=3600.0,  # recycle connections every hour
             open=True,
-            kwargs={"autocommit": True, "row_factory": dict_row},
+            kwargs=connection_kwargs,
+        )
+
+        # Connection of the transaction open in the current context (see transaction())
+        self._pinned_conn: ContextVar[Optional[Connection]] = ContextVar(
+            "neon_db_pinned_conn", default=None
+        )
+
+        # Native async pool for the chat write paths, so inserts don't block the event loop.
+        # It can only be opened inside a running loop (see open_async); min_size=0 keeps it
+        # from holding connections while idle.
+        self._async_pool = AsyncConnectionPool(
+            conninfo=self._db_url,
+            min_size=0,
+            max_size=async_max_size,
+            timeout=acquire_timeout,
+            max_idle=max_idle_seconds,
+            max_lifetime=3600.0,
+            open=False,
+            kwargs=connection_kwargs,
         )
 
     @property
     def pool(self) -> ConnectionPool:
         return self._pool
 
+    @property
+    def async_pool(self) -> AsyncConnectionPool:
+        return self._async_pool
+
+    async def open_async(self) -> None:
+        """
+        Open the async pool (safe to call again once open).
+        """
+        if self._async_pool.closed:
+            await self._async_pool.open()
+
     # ─────────────────────────────────────────
     # Generic helpers
     # ─────────────────────────────────────────
 
+    @contextmanager
+    def _connection(self) -> Iterator[Connection]:
+        """
+        Internal helper: the connection of the open transaction, or one from the pool.
+        """
+        conn = self._pinned_conn.get()
+        if conn is not None:
+            yield conn
+            return
+
+        with self._pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Run the sync helpers called inside the block on one connection, in one transaction.
+        Commits when the block exits normally and rolls back if it raises.
+        A nested block becomes a savepoint: if it raises, only its own statements are undone.
+        """
+        conn = self._pinned_conn.get()
+        if conn is not None:
+            with conn.transaction():
+                yield
+            return
+
+        with self._pool.connection() as conn:
+            with conn.transaction():
+                token = self._pinned_conn.set(conn)
+                try:
+                    yield
+                finally:
+                    self._pinned_conn.reset(token)
+
+    @contextmanager
+    def direct_connection(self) -> Iterator[None]:
+        """
+        Run the sync helpers called inside the block on one connection to the direct
+        (non-pooler) endpoint, e.g. for schema changes. Uses the pool if no direct URL is set.
+        """
+        if not self._direct_db_url:
+            yield
+            return
+
+        with psycopg.connect(self._direct_db_url, **self._connection_kwargs) as conn:
+            token = self._pinned_conn.set(conn)
+            try:
+                yield
+            finally:
+                self._pinned_conn.reset(token)
+
     def execute(
         self,
         sql: str,
@@ -63,7 +173,7 @@ class NeonDB:
         """
         Execute a statement that doesn't return rows (INSERT/UPDATE/DELETE, DDL).
         """
-        with self._pool.connection() as conn:
+        with self._connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(sql, params or ())
 
@@ -75,7 +185,7 @@ class NeonDB:
         """
         Execute a SELECT and return a single row as a dict, or None.
         """
-        with self._pool.connection() as conn:
+        with self._connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(sql, params or ())
                 row = cur.fetchone()
@@ -89,12 +199,38 @@ class NeonDB:
         """
         Execute a SELECT and return all rows as a list of dicts.
         """
-        with self._pool.connection() as conn:
+        with self._connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(sql, params or ())
                 rows = cur.fetchall()
                 return list(rows)
 
+    async def fetch_all_async(
+        self,
+        sql: str,
+        params: Optional[Any] = None,
+    ) -> List[dict]:
+        """
+        Execute a statement on the async pool and return all rows as a list of dicts.
+        """
+        await self.open_async()
+        async with self._async_pool.connection() as conn:
+            cur = await conn.execute(sql, params or ())
+            return list(await cur.fetchall())
+
+    async def execute_async(
+        self,
+        sql: str,
+        params: Optional[Any] = None,
+    ) -> int:
+        """
+        Execute a statement that doesn't return rows on the async pool; returns the affected row count.
+        """
+        await self.open_async()
+        async with self._async_pool.connection() as conn:
+            cur = await conn.execute(sql, params or ())
+            return cur.rowcount
+
     def close(self) -> None:
         """
         Close the pool and all connections (e.g. on app shutdown).
@@ -102,6 +238,13 @@ class NeonDB:
         if self._pool is not None:
             self._pool.close()
 
+    async def close_async(self) -> None:
+        """
+        Close both pools (on app shutdown, from the event loop).
+        """
+        await self._async_pool.close()
+        self.close()
+
     def init_chat_schema(self) -> None:
         """
         Create the chat_messages table if it doesn't exist.
@@ -162,11 +305,36 @@ class NeonDB:
             # Ignore errors if columns already exist or table doesn't exist yet
             pass
 
+        # Session lookups (optionally per stage) return rows in created_at order
+        self.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_chat_messages_session_stage_created
+            ON chat_messages (session_id, stage, created_at);
+            """
+        )
+        # Latest message of a session (see get_last_stage_chat_messages)
+        self.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created
+            ON chat_messages (session_id, created_at);
+            """
+        )
+        # At most one welcome message per session (see get_or_seed_chat_messages)
+        self.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_messages_session_welcome
+            ON chat_messages (session_id)
+            WHERE metadata @> '{"welcome": true}';
+            """
+        )
+
     def _row_to_chat_message(self, row: dict) -> ChatMessageModel:
         """
         Internal helper: convert a DB row dict → ChatMessage Pydantic object.
+        Rows already satisfy the model (column types and the stage CHECK constraint),
+        so validation is skipped.
         """
-        return ChatMessageModel(
+        return ChatMessageModel.model_construct(
             chat_id=row["chat_id"],
             session_id=row["session_id"],
             user_id=row.get("user_id"),
@@ -225,7 +393,92 @@ class NeonDB:
             raise RuntimeError("Failed to insert chat message")
 
         # If you're using ChatMessageModel as the Pydantic class:
-        return ChatMessageModel(**row)
+        return self._row_to_chat_message(row)
+
+    @staticmethod
+    def _insert_chat_messages_query(
+        msgs: List[ChatMessageModel],
+        returning: bool = True,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Internal helper: build the multi-row INSERT (and its params) for `msgs`.
+        clock_timestamp() is evaluated per row, so created_at keeps the list order.
+        """
+        row_sql = """(
+            %(chat_id_{i})s,
+            %(session_id_{i})s,
+            %(user_id_{i})s,
+            %(role_{i})s,
+            %(formatted_output_{i})s,
+            %(content_{i})s,
+            %(metadata_{i})s,
+            %(stage_{i})s,
+            clock_timestamp(),
+            clock_timestamp()
+        )"""
+        sql = """
+        INSERT INTO chat_messages (
+            chat_id,
+            session_id,
+            user_id,
+            role,
+            formatted_output,
+            content,
+            metadata,
+            stage,
+            created_at,
+            updated_at
+        )
+        VALUES {values}
+        {returning};
+        """.format(
+            values=", ".join(row_sql.format(i=i) for i in range(len(msgs))),
+            returning="RETURNING *" if returning else "",
+        )
+
+        params: Dict[str, Any] = {}
+        for i, msg in enumerate(msgs):
+            params.update({
+                f"chat_id_{i}": msg.chat_id,
+                f"session_id_{i}": msg.session_id,
+                f"user_id_{i}": msg.user_id,
+                f"role_{i}": msg.role,
+                f"formatted_output_{i}": msg.formatted_output,
+                f"content_{i}": msg.content,
+                f"metadata_{i}": Json(msg.metadata or {}),
+                f"stage_{i}": msg.stage,
+            })
+        return sql, params
+
+    def _inserted_chat_messages(self, msgs: List[ChatMessageModel], rows: List[dict]) -> List[ChatMessageModel]:
+        if len(rows) != len(msgs):
+            raise RuntimeError("Failed to insert chat messages")
+
+        rows.sort(key=lambda r: r["created_at"])
+        return [self._row_to_chat_message(row) for row in rows]
+
+    def create_chat_messages(self, msgs: List[ChatMessageModel]) -> List[ChatMessageModel]:
+        """
+        Insert several chat messages with one multi-row INSERT, in list order.
+        """
+        if not msgs:
+            return []
+
+        sql, params = self._insert_chat_messages_query(msgs)
+        return self._inserted_chat_messages(msgs, self.fetch_all(sql, params))
+
+    async def insert_chat_messages_async(self, msgs: List[ChatMessageModel]) -> None:
+        """
+        Insert several chat messages with one multi-row INSERT, in list order,
+        without sending the rows back (for write-only callers).
+        """
+        if not msgs:
+            return
+
+        sql, params = self._insert_chat_messages_query(msgs, returning=False)
+        inserted = await self.execute_async(sql, params)
+        if inserted != len(msgs):
+            raise RuntimeError("Failed to insert chat messages")
 
     def get_chat_messages_by_session(
         self,
@@ -242,8 +495,7 @@ class NeonDB:
             FROM chat_messages
             WHERE session_id = %(session_id)s
               AND stage = %(stage)s
-            ORDER BY created_at ASC
-            LIMIT %(limit)s;
+            ORDER BY created_at ASC;
             """
             params = {
                 "session_id": session_id,
@@ -263,6 +515,98 @@ class NeonDB:
         rows = self.fetch_all(sql, params)
         return [self._row_to_chat_message(r) for r in rows]
 
+    def get_last_stage_chat_messages(self, session_id: str) -> List[ChatMessageModel]:
+        """
+        Fetch the messages of the stage the session's latest message belongs to.
+        Ordered by created_at timestamp; the last row is the latest message of the session.
+        """
+        sql = """
+        SELECT *
+        FROM chat_messages
+        WHERE session_id = %(session_id)s
+          AND stage = (
+              SELECT stage
+              FROM chat_messages
+              WHERE session_id = %(session_id)s
+              ORDER BY created_at DESC
+              LIMIT 1
+          )
+        ORDER BY created_at ASC;
+        """
+        rows = self.fetch_all(sql, {"session_id": session_id})
+        return [self._row_to_chat_message(r) for r in rows]
+
+    def get_or_seed_chat_messages(
+        self,
+        session_id: str,
+        seed: ChatMessageModel,
+    ) -> List[ChatMessageModel]:
+        """
+        Fetch all chat messages for a session; if it has none, insert `seed` and return it.
+        Read and conditional insert run as one statement (one round-trip).
+        A seed with metadata {"welcome": true} is inserted at most once per session: if a
+        concurrent request seeded the session first, the insert is skipped and the session re-read.
+        """
+        sql = """
+        WITH existing AS (
+            SELECT *
+            FROM chat_messages
+            WHERE session_id = %(session_id)s
+        ),
+        seeded AS (
+            INSERT INTO chat_messages (
+                chat_id,
+                session_id,
+                user_id,
+                role,
+                formatted_output,
+                content,
+                metadata,
+                stage,
+                created_at,
+                updated_at
+            )
+            SELECT
+                %(chat_id)s,
+                %(session_id)s,
+                %(user_id)s,
+                %(role)s,
+                %(formatted_output)s,
+                %(content)s,
+                %(metadata)s,
+                %(stage)s,
+                NOW(),
+                NOW()
+            WHERE NOT EXISTS (SELECT 1 FROM existing)
+            ON CONFLICT (session_id) WHERE metadata @> '{"welcome": true}' DO NOTHING
+            RETURNING *
+        )
+        SELECT * FROM (
+            SELECT * FROM existing
+            UNION ALL
+            SELECT * FROM seeded
+        ) AS messages
+        ORDER BY created_at ASC;
+        """
+
+        params = {
+            "chat_id": seed.chat_id,
+            "session_id": session_id,
+            "user_id": seed.user_id,
+            "role": seed.role,
+            "formatted_output": seed.formatted_output,
+            "content": seed.content,
+            "metadata": Json(seed.metadata or {}),
+            "stage": seed.stage,
+        }
+
+        rows = self.fetch_all(sql, params)
+        if not rows:
+            # Lost the race to seed the session; the other request's seed is committed by now
+            return self.get_chat_messages_by_session(session_id)
+        return [self._row_to_chat_message(r) for r in rows]
+
+
 
     def init_idea_state_schema(self) -> None:
         """
@@ -475,6 +819,28 @@ class NeonDB:
             raise RuntimeError("Document not found or not updated")
 
         return row
+
+    def update_documents_project_id(
+        self,
+        document_ids: List[str],
+        project_id: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Set project_id on several documents with one UPDATE (one round-trip).
+        Also bumps updated_at = NOW(). Returns the updated rows; unknown ids are ignored.
+        """
+        if not document_ids:
+            return []
+
+        sql = """
+        UPDATE documents
+        SET project_id = %(project_id)s,
+            updated_at = NOW()
+        WHERE id = ANY(%(ids)s::uuid[])
+        RETURNING *;
+        """
+
+        return self.fetch_all(sql, {"project_id": project_id, "ids": [str(i) for i in document_ids]})
     
     def get_documents_by_session_id(
         self,
@@ -741,6 +1107,71 @@ class NeonDB:
 
         return row
 
+    # tasks columns written by create_tasks -> create_task keyword argument
+    _TASK_INSERT_COLUMNS = (
+        ("project_id", "project_id"),
+        ("key", "key"),
+        ("title", "title"),
+        ("sprint_week", "sprint_week"),
+        ("tags", "tags"),
+        ("description", "description"),
+        ("ai_description", "ai_description"),
+        ("task_generated_by", "generated_by"),
+        ("task_status", "status"),
+        ("priority", "priority"),
+        ("assignee_id", "assignee_id"),
+        ("reporter_id", "reporter_id"),
+        ("parent_task_id", "parent_task_id"),
+        ("timeline_days", "timeline_days"),
+        ("start_date", "start_date"),
+        ("due_date", "due_date"),
+    )
+
+    def create_tasks(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert several tasks with one multi-row INSERT (one round-trip).
+        Each item takes the keyword arguments of create_task, with the same defaults.
+        """
+        if not tasks:
+            return []
+
+        defaults: Dict[str, Any] = {
+            "sprint_week": 0,
+            "tags": None,
+            "description": None,
+            "ai_description": None,
+            "generated_by": "ai",
+            "status": "todo",
+            "priority": "Medium",
+            "assignee_id": None,
+            "reporter_id": None,
+            "parent_task_id": None,
+            "timeline_days": None,
+            "start_date": None,
+            "due_date": None,
+        }
+
+        values = []
+        params: Dict[str, Any] = {}
+        for i, task in enumerate(tasks):
+            task = {**defaults, **task}
+            task["tags"] = task["tags"] or []
+            values.append(
+                "(" + ", ".join(f"%({arg}_{i})s" for _, arg in self._TASK_INSERT_COLUMNS) + ")"
+            )
+            params.update({f"{arg}_{i}": task[arg] for _, arg in self._TASK_INSERT_COLUMNS})
+
+        sql = """
+        INSERT INTO tasks ({columns})
+        VALUES {values}
+        RETURNING *;
+        """.format(
+            columns=", ".join(column for column, _ in self._TASK_INSERT_COLUMNS),
+            values=", ".join(values),
+        )
+
+        return self.fetch_all(sql, params)
+
     def update_task(
         self,
         task_id: str,
@@ -1,7 +1,12 @@
 import json
-from typing import List, Dict, Tuple, Optional, Any, Union, AsyncGenerator
+import asyncio
+import orjson
+import functools
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional, Any, Union, AsyncGenerator, get_args
 import logging
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from pydantic import BaseModel
 
 from src.agents.idea_evaluation_agent import IdeaEvaluationAgent
 from src.agents.deep_idea_analysis_agent import DeepIdeaAnalysisAgent
@@ -19,39 +24,101 @@ from src.handlers.stage_completion import StageCompletion
 
 from src.states.global_idea_state import GlobalIdeaState
 from src.models.chat_transfer_model import ChatResponse, UserPreferences
+from src.models.chat_message_model import ChatMessageModel
 
 from src.handlers.message_storage import (    
+    build_agent_message,
     save_agent_message,
 )
+from src.handlers.message_writer import MessageWriter
 
 from src.utils.context_vars import set_db, set_session_id
 
 logger = logging.getLogger(__name__)
 
+# Static greeting fragments for stage transitions (only the JSON blobs vary per call)
+_GREETING_PREFIX = "Let's continue our discussion. Here's the idea context so far:\n\n<< idea context >>\n\n"
+_GREETING_SUFFIX = "\n\n<< idea context >>\n"
+_PREFS_PREFIX = "\n<< user preferences >>\n\n"
+_PREFS_SUFFIX = "\n\n<< user preferences >>\n"
+
+
+def _contains_model(annotation: Any) -> bool:
+    """True if the annotation is, or wraps, a pydantic model (e.g. Optional[List[TeamMember]])."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return True
+    return any(_contains_model(arg) for arg in get_args(annotation))
+
+
+# Known state fields, and the subset holding nested models that still need validation
+_STATE_FIELDS = frozenset(GlobalIdeaState.model_fields)
+_NESTED_STATE_FIELDS = frozenset(
+    name for name, field in GlobalIdeaState.model_fields.items() if _contains_model(field.annotation)
+)
+
+# Message class -> constructor used to rebuild an enhanced last message
+# (other BaseMessage types are added on first successful use)
+_MSG_CTORS: Dict[type, Any] = {HumanMessage: HumanMessage, AIMessage: AIMessage}
+
+
+@functools.lru_cache(maxsize=256)
+def _prefs_json(user_preferences: UserPreferences) -> str:
+    """Serialized user preferences (UserPreferences is frozen, so instances are hashable)."""
+    return user_preferences.model_dump_json()
+
+
+def _dump_formatted_output(structured_response: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Serialize a structured response for database storage."""
+    if not structured_response:
+        return None
+    try:
+        return orjson.dumps(structured_response).decode()
+    except TypeError:
+        # orjson rejects e.g. non-str keys; fall back to the stdlib encoder
+        return json.dumps(structured_response, separators=(",", ":"))
+
+class _SessionState:
+    """Global idea state of one session, with its derived caches."""
+
+    __slots__ = ("state", "version", "greeting_cache", "state_json")
+
+    def __init__(self):
+        self.state = GlobalIdeaState()
+        # Bumped on every state mutation; keys the caches below
+        self.version = 0
+        # ((state version, preferences), rendered greeting)
+        self.greeting_cache: Optional[Tuple[Tuple[int, Optional[UserPreferences]], str]] = None
+        # (state version, filtered global state JSON) shared by greetings with any preferences
+        self.state_json: Optional[Tuple[int, str]] = None
+
+
 ## All the agents will be initialized here and executed in sequence
 class Workflow:
     """
     Workflow class that manages the multi-stage agent execution.
     
-    Thread Safety:
-    - Global state updates are protected by a reentrant lock (_state_lock)
-    - All state access should use the provided thread-safe methods:
+    Concurrency:
+    - Each session has its own global idea state
+    - State is only touched from the event loop thread, and the accessors below are
+      synchronous (no await points), so each call is atomic with respect to other
+      coroutines and needs no lock. Background threads get a frozen snapshot instead.
+    - All state access should use the provided methods (all keyed by session_id):
       - get_global_idea_state() - for reading state
       - get_global_idea_state_snapshot() - for background jobs
       - set_global_idea_state() - for replacing entire state
       - update_global_idea_state() - for merging updates
       - update_global_idea_state_field() - for single field updates
-    - Direct access to self.global_idea_state should be avoided
+    - Session states are kept in an LRU; an evicted session starts from an empty state
+      until it is reloaded (see has_session_state())
     """
-    def __init__(self, model, db: NeonDB):
-        """Initialize workflow with all agents and global state."""
-        # Global Idea State
-        self.global_idea_state = GlobalIdeaState()
-        
-        # Thread-safe lock for global state updates
-        # Using RLock (reentrant lock) to allow nested calls from the same thread
-        import threading
-        self._state_lock = threading.RLock()
+    def __init__(self, model, db: NeonDB, max_sessions: int = 1024):
+        """Initialize workflow with all agents and the per-session state registry."""
+        # Global Idea State per session_id (least recently used first)
+        self._sessions: "OrderedDict[str, _SessionState]" = OrderedDict()
+        self.max_sessions = max_sessions
+
+        # Fire-and-forget message saves (bounded queue; drained on shutdown)
+        self.message_writer = MessageWriter()
         
         # Initialize all agents for stages 1-8
         self.idea_evaluation_agent = IdeaEvaluationAgent(model=model)
@@ -64,6 +131,18 @@ class Workflow:
         self.constraint_analysis_agent = ConstraintAnalysisAgent(model=model)
         self.sprint_planner_agent = SprintPlannerAgent(model=model)
         self.narrative_agent = NarrativeSectionAgent(model=model)
+
+        # Stage agents in stage order (index = stage - 1)
+        self._stage_agents = (
+            self.idea_evaluation_agent,
+            self.team_profile_agent,
+            self.deep_idea_analysis_agent,
+            self.market_competition_agent,
+            self.technology_implementation_agent,
+            self.business_goals_agent,
+            self.execution_preferences_agent,
+            self.constraint_analysis_agent,
+        )
         
         self.stage_completion = StageCompletion(
             db=db,
@@ -82,17 +161,58 @@ class Workflow:
         Returns:
             Agent instance or None if stage is invalid
         """
-        agent_map = {
-            1: self.idea_evaluation_agent,
-            2: self.team_profile_agent,
-            3: self.deep_idea_analysis_agent,
-            4: self.market_competition_agent,
-            5: self.technology_implementation_agent,
-            6: self.business_goals_agent,
-            7: self.execution_preferences_agent,
-            8: self.constraint_analysis_agent,
-        }
-        return agent_map.get(stage)
+        return self._stage_agents[stage - 1] if 1 <= stage <= 8 else None
+    
+    @staticmethod
+    def _error(
+        stage: int,
+        error_message: str,
+        formatted_output: Optional[Dict] = None,
+        log_level: Optional[int] = logging.ERROR,
+    ) -> ChatResponse:
+        """Log an error (unless log_level is None) and build the error ChatResponse."""
+        if log_level is not None:
+            logger.log(log_level, error_message)
+        return ChatResponse(
+            connection_status="error",
+            error_message=error_message,
+            idea_state_stage=stage,
+            formatted_output=formatted_output
+        )
+    
+    @staticmethod
+    async def _await_save(save: "asyncio.Future[bool]", stage: int) -> None:
+        """Wait for a background save; a failure is logged and never fails the turn."""
+        try:
+            if not await save:
+                logger.error("Stage %d message was not saved", stage)
+        except Exception as e:
+            logger.error("Error saving stage %s message: %s", stage, e, exc_info=True)
+
+    async def _save_in_background(
+        self,
+        user_message: Optional[ChatMessageModel] = None,
+        *,
+        session_id: str,
+        user_id: Optional[str],
+        content: str,
+        db,
+        stage: int,
+        formatted_output: Optional[str] = None,
+    ) -> "asyncio.Future[bool]":
+        """
+        Queue an agent reply for saving and return a future for the result.
+        A pending user_message is written together with the reply, in one insert.
+        Waits for room when the writer's queue is full.
+        """
+        messages = [build_agent_message(session_id, user_id, content, stage, formatted_output)] if content else []
+        if user_message is not None:
+            messages.insert(0, user_message)
+        return await self.message_writer.submit(db, messages)
+
+    async def drain_background_tasks(self) -> None:
+        """Flush all queued message saves and stop the writer (call on shutdown)."""
+        await self.message_writer.close()
     
     def _enhance_message_with_context(
         self, 
@@ -110,7 +230,8 @@ class Workflow:
             user_preferences: Optional user preferences to add
             
         Returns:
-            Enhanced messages list (creates a copy to avoid mutating input)
+            Enhanced messages list. The input list is returned unchanged when there is
+            nothing to add; otherwise a new list is returned and the input is not mutated.
             
         Raises:
             ValueError: If messages list is empty
@@ -118,51 +239,52 @@ class Workflow:
         if not messages:
             raise ValueError("Messages list cannot be empty")
         
-        # Create a copy to avoid mutating the original
-        enhanced_messages = messages.copy()
-        last_message = enhanced_messages[-1]
-        content_parts = []
+        # Nothing to add - pass the original list through without copying
+        # (global idea state is added via the stage greeting message instead)
+        if user_preferences is None:
+            return messages
         
-        # Add user preferences first if provided
-        if user_preferences:
-            content_parts.append("<< user preferences >>")
-            content_parts.append(user_preferences.model_dump_json())
-            content_parts.append("<< user preferences >>")
-            content_parts.append("")  # Empty line separator
-        
-        # Note: Global idea state context is now added via greeting message
-        # when transitioning to next stage, not in message enhancement
+        last_message = messages[-1]
+        content_parts = [
+            "<< user preferences >>",
+            _prefs_json(user_preferences),
+            "<< user preferences >>",
+            "",  # Empty line separator
+        ]
         
         # Add original content at the end
-        if content_parts:
-            # Handle both dictionary and LangChain message objects
-            if isinstance(last_message, BaseMessage):
-                # LangChain message object - update content attribute
-                original_content = getattr(last_message, 'content', "")
-                enhanced_content = "\n".join(content_parts) + "\n" + str(original_content)
-                # Create a new message with updated content (LangChain messages are immutable)
-                if isinstance(last_message, HumanMessage):
-                    enhanced_messages[-1] = HumanMessage(content=enhanced_content)
-                elif isinstance(last_message, AIMessage):
-                    enhanced_messages[-1] = AIMessage(content=enhanced_content)
-                else:
-                    # Fallback: try to create same type with content
-                    try:
-                        enhanced_messages[-1] = type(last_message)(content=enhanced_content)
-                    except Exception as e:
-                        logger.warning(f"Could not create enhanced message of type {type(last_message)}: {e}")
-                        # Keep original message if we can't enhance it
-            elif isinstance(last_message, dict):
-                # Dictionary message - update content key
-                last_message = last_message.copy()
-                original_content = last_message.get("content", "")
-                enhanced_content = "\n".join(content_parts) + "\n" + str(original_content)
-                last_message["content"] = enhanced_content
-                enhanced_messages[-1] = last_message
+        enhanced_last = None
+        # Handle both dictionary and LangChain message objects
+        if isinstance(last_message, BaseMessage):
+            # LangChain message object - update content attribute
+            original_content = getattr(last_message, 'content', "")
+            enhanced_content = "\n".join(content_parts) + "\n" + str(original_content)
+            # Create a new message with updated content (LangChain messages are immutable)
+            message_type = type(last_message)
+            ctor = _MSG_CTORS.get(message_type)
+            if ctor is not None:
+                enhanced_last = ctor(content=enhanced_content)
             else:
-                logger.warning(f"Unknown message type: {type(last_message)}, skipping enhancement")
+                # Fallback: try to create same type with content, remembering it on success
+                try:
+                    enhanced_last = message_type(content=enhanced_content)
+                    _MSG_CTORS[message_type] = message_type
+                except Exception as e:
+                    logger.warning("Could not create enhanced message of type %s: %s", message_type, e)
+                    # Keep original message if we can't enhance it
+        elif isinstance(last_message, dict):
+            # Dictionary message - update content key on a copy
+            original_content = last_message.get("content", "")
+            enhanced_content = "\n".join(content_parts) + "\n" + str(original_content)
+            enhanced_last = {**last_message, "content": enhanced_content}
+        else:
+            logger.warning("Unknown message type: %s, skipping enhancement", type(last_message))
+        
+        if enhanced_last is None:
+            return messages
         
-        return enhanced_messages
+        # New list sharing all but the last message (never mutates the input)
+        return messages[:-1] + [enhanced_last]
     
     def _process_agent_response(self, response: Dict, stage: int) -> Tuple[Optional[ChatResponse], Optional[Dict]]:
         """
@@ -175,27 +297,21 @@ class Workflow:
         Returns:
             Tuple of (error_response, None) if error occurred, or (None, structured_response_dict) if successful
         """
-        # Check for error in response
-        if response.get("error") or (isinstance(response.get("structured_response"), dict) and response.get("structured_response", {}).get("error")):
-            error_message = response.get("error_message") or response.get("structured_response", {}).get("error_message", "Unknown error occurred")
-            logger.error(f"Stage {stage} agent returned error: {error_message}")
-            return ChatResponse(
-                connection_status="error",
-                error_message=error_message,
-                idea_state_stage=stage,
-                formatted_output=response.get("structured_response")
-            ), None
-        
         structured_response = response.get("structured_response")
-        
+        sr_is_dict = isinstance(structured_response, dict)
+
+        # Check for error in response
+        if response.get("error") or (sr_is_dict and structured_response.get("error")):
+            error_message = (
+                response.get("error_message")
+                or (sr_is_dict and structured_response.get("error_message"))
+                or "Unknown error occurred"
+            )
+            logger.error("Stage %d agent returned error: %s", stage, error_message)
+            return self._error(stage, error_message, structured_response, log_level=None), None
+
         if not structured_response:
-            error_message = f"Stage {stage} agent returned empty structured_response"
-            logger.error(error_message)
-            return ChatResponse(
-                connection_status="error",
-                error_message=error_message,
-                idea_state_stage=stage
-            ), None
+            return self._error(stage, f"Stage {stage} agent returned empty structured_response"), None
         
         # Ensure structured_response is a dict
         if not isinstance(structured_response, dict):
@@ -206,58 +322,72 @@ class Workflow:
         
         return None, structured_response
     
-    def _create_stage_greeting_message(self, formatted_output_json: Optional[str] = None, user_preferences: Optional[UserPreferences] = None) -> HumanMessage:
+    def _session(self, session_id: str) -> _SessionState:
+        """Return the state holder for a session, creating it (and evicting the LRU one) if needed."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _SessionState()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def has_session_state(self, session_id: str) -> bool:
+        """True if the session's idea state is held in memory."""
+        return session_id in self._sessions
+
+    def _global_state_context_json(self, session_id: str) -> str:
+        """
+        Filtered global idea state as indented JSON, memoized per state version.
         """
-        Create a greeting message for the next stage with global idea context.
+        session = self._session(session_id)
+        global_idea_state = session.state
+        version = session.version
+
+        cached = session.state_json
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        # Get global state as dict without None values, then drop empty strings/lists/dicts
+        # (all top-level fields are strings, lists or models, so falsy means empty)
+        filtered_state = {
+            key: value for key, value in global_idea_state.model_dump(exclude_none=True).items()
+            if value and not (isinstance(value, str) and not value.strip())
+        }
+        context_json = orjson.dumps(filtered_state, option=orjson.OPT_INDENT_2).decode() if filtered_state else "{}"
+        session.state_json = (version, context_json)
+        return context_json
+
+    def _create_stage_greeting_message(self, session_id: str, formatted_output_json: Optional[str] = None, user_preferences: Optional[UserPreferences] = None) -> HumanMessage:
+        """
+        Create a greeting message for the next stage with the session's global idea context.
         
         Returns:
             HumanMessage with greeting and global context
         """
-        # Helper function to filter out None and empty values
-        def filter_empty_values(data: Dict) -> Dict:
-            """Filter out keys with None, empty string, empty list, or empty dict values."""
-            filtered = {}
-            for key, value in data.items():
-                if value is None:
-                    continue
-                if isinstance(value, str) and value.strip() == "":
-                    continue
-                if isinstance(value, list) and len(value) == 0:
-                    continue
-                if isinstance(value, dict) and len(value) == 0:
-                    continue
-                filtered[key] = value
-            return filtered
-        
-        print(f"global_idea_state: {self.global_idea_state.idea_title}")
-        
-        # Get the context JSON - either formatted_output_json or filtered global_idea_state
-        if formatted_output_json:
-            context_json = formatted_output_json
-        else:
-            # Get global state as dict and filter out empty values
-            global_state_dict = self.global_idea_state.model_dump()
-            filtered_state = filter_empty_values(global_state_dict)
-            context_json = json.dumps(filtered_state, indent=2) if filtered_state else "{}"
-        
-        greeting_content = f"""Let's continue our discussion. Here's the idea context so far:
+        session = self._session(session_id)
+        cache_key = (session.version, user_preferences)
 
-        << idea context >>
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("global_idea_state: %s", session.state.idea_title)
 
-        {context_json}
+        # Reuse the rendered greeting while neither the state nor the preferences changed
+        cached = session.greeting_cache
+        if not formatted_output_json and cached is not None and cached[0] == cache_key:
+            return HumanMessage(content=cached[1])
 
-        << idea context >>
-        """
+        # Get the context JSON - either formatted_output_json or filtered global_idea_state
+        context_json = formatted_output_json or self._global_state_context_json(session_id)
         
+        parts = [_GREETING_PREFIX, context_json, _GREETING_SUFFIX]
         if user_preferences:
-            greeting_content += f"""
-            << user preferences >>
+            parts += (_PREFS_PREFIX, _prefs_json(user_preferences), _PREFS_SUFFIX)
+        greeting_content = "".join(parts)
 
-            {user_preferences.model_dump_json()}
+        if not formatted_output_json:
+            session.greeting_cache = (cache_key, greeting_content)
 
-            << user preferences >>
-            """
-        
         return HumanMessage(content=greeting_content)
         
     async def execute(
@@ -267,7 +397,8 @@ class Workflow:
         session_id: str, 
         user_id: str, 
         db, 
-        user_preferences: Optional[UserPreferences] = None
+        user_preferences: Optional[UserPreferences] = None,
+        pending_user_message: Optional[ChatMessageModel] = None
     ) -> AsyncGenerator[ChatResponse, None]:
         """
         Execute workflow for a given stage.
@@ -279,6 +410,8 @@ class Workflow:
             user_id: User identifier
             db: Database instance
             user_preferences: Optional user preferences
+            pending_user_message: Optional unsaved user message; it is stored together with
+                the first agent reply, or on its own if the turn ends without one
             
         Returns:
             ChatResponse with agent response or error
@@ -291,7 +424,7 @@ class Workflow:
                 # Get a thread-safe snapshot of global state to pass to background job
                 # This ensures the background thread has an immutable snapshot that won't change
                 # even if the main thread updates the state during background processing
-                global_state_copy = self.get_global_idea_state_snapshot()
+                global_state_copy = self.get_global_idea_state_snapshot(session_id)
                 async for event in self.stage_completion.complete_stage(
                     global_state_copy, 
                     session_id,
@@ -321,62 +454,52 @@ class Workflow:
                 return
             
             # Validate stage (1-8 for normal workflow)
-            if stage is None or not isinstance(stage, int) or stage < 1 or stage > 8:
-                error_message = f"Invalid stage: {stage}. Must be between 1 and 8, or 9 for stage completion."
-                logger.error(error_message)
-                yield ChatResponse(
-                    connection_status="error",
-                    error_message=error_message,
-                    idea_state_stage=stage
-                )
+            # stage is typed int (callers validate it at the API boundary); stage 9 is handled above
+            if not 1 <= stage <= 8:
+                yield self._error(stage, f"Invalid stage: {stage}. Must be between 1 and 8, or 9 for stage completion.")
+                return
+            
+            # Get the appropriate agent for this stage
+            agent = self._get_agent_for_stage(stage)
+            if not agent:
+                yield self._error(stage, f"No agent found for stage {stage}")
                 return
             
             # Validate messages list is not empty
             if not messages:
-                error_message = "Messages list cannot be empty"
-                logger.error(error_message)
-                yield ChatResponse(
-                    connection_status="error",
-                    error_message=error_message,
-                    idea_state_stage=stage
-                )
+                yield self._error(stage, "Messages list cannot be empty")
                 return
             
             # Enhance messages with context (user preferences and/or global state)
             try:
                 enhanced_messages = self._enhance_message_with_context(messages, stage, user_preferences)
             except ValueError as e:
-                logger.error(f"Error enhancing messages: {e}")
-                yield ChatResponse(
-                    connection_status="error",
-                    error_message=str(e),
-                    idea_state_stage=stage
-                )
+                logger.error("Error enhancing messages: %s", e)
+                yield self._error(stage, str(e), log_level=None)
                 return
             
             # For stages > 1, always prepend the greeting message with global context
             if stage > 1:
-                greeting_message = self._create_stage_greeting_message(user_preferences=user_preferences)
-                enhanced_messages = [greeting_message] + enhanced_messages
+                greeting_message = self._create_stage_greeting_message(session_id, user_preferences=user_preferences)
+                if enhanced_messages is messages:
+                    # Caller's list was passed through - build a new one rather than mutate it
+                    enhanced_messages = [greeting_message, *enhanced_messages]
+                else:
+                    # Already a fresh list owned here - prepend in place
+                    enhanced_messages.insert(0, greeting_message)
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Enhanced messages count=%d last_len=%d",
+                    len(enhanced_messages), len(str(enhanced_messages[-1])),
+                )
             
             # Set context variables for db and session_id so tools can access them
             set_db(db)
             set_session_id(session_id)
             
-            # Get the appropriate agent for this stage
-            agent = self._get_agent_for_stage(stage)
-            if not agent:
-                error_message = f"No agent found for stage {stage}"
-                logger.error(error_message)
-                yield ChatResponse(
-                    connection_status="error",
-                    error_message=error_message,
-                    idea_state_stage=stage
-                )
-                return
-            
             # Invoke the agent
-            response = agent.invoke(enhanced_messages)
+            response = await agent.ainvoke(enhanced_messages)
             
             # Process the response
             error_response, structured_response = self._process_agent_response(response, stage)
@@ -384,6 +507,9 @@ class Workflow:
                 yield error_response
                 return
             
+            # Serialized once and reused for every save below
+            formatted_output_json = _dump_formatted_output(structured_response)
+            
             # Extract state and follow_up_question
             state = structured_response.get("state")
             follow_up_question = structured_response.get("follow_up_question", "")
@@ -392,12 +518,13 @@ class Workflow:
             # If state is completed, update global state and move to next stage
             if state == "completed":
                 # Update global state with completed stage data
-                self.update_global_idea_state(structured_response)
+                self.update_global_idea_state(session_id, structured_response)
                 next_stage = stage + 1
                 
-                # Save completed stage message to database
-                formatted_output_json = json.dumps(structured_response) if structured_response else None
-                await save_agent_message(
+                # Save completed stage message to database in the background
+                # (runs alongside the next stage invocation)
+                save_result = await self._save_in_background(
+                    pending_user_message,
                     session_id=session_id,
                     user_id=user_id,
                     content="Stage completed",
@@ -405,11 +532,14 @@ class Workflow:
                     stage=stage,
                     formatted_output=formatted_output_json
                 )
+                pending_user_message = None
                 
                 # Validate next stage is within bounds
                 # Scenario 2: Stage 8 completion -> next_stage becomes 9 (COMMENTED OUT FOR NOW)
                 if next_stage > 8:
-                    logger.info(f"Stage {stage} completed, next stage is {next_stage} - triggering stage completion")
+                    # The next request resolves stage 9 from this message, so it must be stored first
+                    await self._await_save(save_result, stage)
+                    logger.info("Stage %d completed, next stage is %d - triggering stage completion", stage, next_stage)
                     yield ChatResponse(
                         connection_status="active",
                         idea_state_stage=9,
@@ -441,20 +571,14 @@ class Workflow:
                     # Invoke next stage agent
                     next_agent = self._get_agent_for_stage(next_stage)
                     if not next_agent:
-                        error_message = f"No agent found for stage {next_stage}"
-                        logger.error(error_message)
-                        yield ChatResponse(
-                            connection_status="error",
-                            error_message=error_message,
-                            idea_state_stage=next_stage
-                        )
+                        yield self._error(next_stage, f"No agent found for stage {next_stage}")
                         return
                     
                     # For next stage (> 1), create greeting message with global context
                     # The greeting message will be prepended automatically in the main flow for stages > 1
                     # But when transitioning, we need to invoke with just the greeting message to start the conversation
-                    greeting_message = self._create_stage_greeting_message()
-                    next_response = next_agent.invoke([greeting_message])
+                    greeting_message = self._create_stage_greeting_message(session_id)
+                    next_response = await next_agent.ainvoke([greeting_message])
                     next_error_response, next_structured_response = self._process_agent_response(next_response, next_stage)
                     
                     if next_error_response:
@@ -465,13 +589,13 @@ class Workflow:
                     state = next_structured_response.get("state")
                     follow_up_question = next_structured_response.get("follow_up_question", "")
                     structured_response = next_structured_response
+                    formatted_output_json = _dump_formatted_output(structured_response)
             
             # Return response if there's a follow_up_question
             if follow_up_question:
-                # Serialize structured_response to JSON string for database storage
-                formatted_output_json = json.dumps(structured_response) if structured_response else None
-
-                await save_agent_message(
+                # Save in the background; the response does not wait for the DB write
+                await self._save_in_background(
+                    pending_user_message,
                     session_id=session_id,
                     user_id=user_id,
                     content=follow_up_question,
@@ -479,6 +603,7 @@ class Workflow:
                     stage=current_stage,
                     formatted_output=formatted_output_json
                 )
+                pending_user_message = None
                 
                 yield ChatResponse(
                     connection_status="active",
@@ -489,78 +614,86 @@ class Workflow:
                 return
             
             # If the state is not completed and there is no follow_up_question
-            error_message = "State is not completed and there is no follow_up_question"
-            logger.warning(error_message)
-            yield ChatResponse(
-                connection_status="error",
-                error_message=error_message,
-                idea_state_stage=current_stage
+            yield self._error(
+                current_stage,
+                "State is not completed and there is no follow_up_question",
+                log_level=logging.WARNING,
             )
             return
             
         except Exception as e:
-            logger.error(f"Error in workflow.execute: {e}", exc_info=True)
+            logger.error("Error in workflow.execute: %s", e, exc_info=True)
             # Use stage from outer scope, fallback to 1 if undefined or None
             error_stage = stage if ('stage' in locals() and stage is not None and isinstance(stage, int)) else 1
-            yield ChatResponse(
-                connection_status="error",
-                error_message=f"Workflow execution error: {str(e)}",
-                idea_state_stage=error_stage
-            )
+            yield self._error(error_stage, f"Workflow execution error: {str(e)}", log_level=None)
             return            
+        finally:
+            # No agent reply was saved - still keep the user's message
+            if pending_user_message is not None:
+                await self.message_writer.submit(db, [pending_user_message])
 
-    def update_global_idea_state(self, structured_response: Dict) -> None:
+    def update_global_idea_state(self, session_id: str, structured_response: Dict) -> None:
         """
-        Thread-safe update of the global idea state with the structured response.
+        Update a session's global idea state with the structured response.
         Merges new values from structured_response with existing state values.
         Only updates fields that are present in structured_response (non-None values).
         Preserves existing values for fields not present in structured_response.
         
-        This method is thread-safe and prevents race conditions when multiple
-        requests try to update the state simultaneously.
+        Runs without await points, so concurrent requests on the event loop
+        never observe a partially applied update.
         
         Args:
+            session_id: Session whose state is updated
             structured_response: Dictionary containing state fields to update
         """
-        with self._state_lock:
-            try:
-                # Get current state as dict (creates a snapshot)
-                current_state_dict = self.global_idea_state.model_dump()
-                
-                # Filter out None values from structured_response to avoid overwriting existing values
-                # Only update fields that have actual values (not None)
-                updates = {k: v for k, v in structured_response.items() if v is not None}
-                
-                # Merge updates into current state
-                merged_state = {**current_state_dict, **updates}
-                
-                # Create new state instance from merged dict (atomic assignment)
-                self.global_idea_state = GlobalIdeaState.model_validate(merged_state, strict=False)
-                logger.debug("Updated global idea state successfully")
-            except Exception as e:
-                logger.error(f"Error updating global idea state: {e}", exc_info=True)
-                raise
+        session = self._session(session_id)
+        try:
+            # Filter out None values from structured_response to avoid overwriting existing values
+            # Only update known state fields that have actual values (not None)
+            updates = {
+                k: v for k, v in structured_response.items()
+                if v is not None and k in _STATE_FIELDS
+            }
+            if not updates:
+                return
+
+            # Only nested-model fields need validation (e.g. team dicts -> TeamMember)
+            nested = updates.keys() & _NESTED_STATE_FIELDS
+            if nested:
+                validated = GlobalIdeaState.model_validate({k: updates[k] for k in nested}, strict=False)
+                updates.update((k, getattr(validated, k)) for k in nested)
+
+            current = session.state
+            changed = {k: v for k, v in updates.items() if v != getattr(current, k)}
+            if not changed:
+                logger.debug("Global idea state unchanged, skipping update")
+                return
+
+            # Copy with the changed fields only (atomic assignment, no full re-validation)
+            session.state = current.model_copy(update=changed)
+            session.version += 1
+            logger.debug("Updated global idea state successfully")
+        except Exception as e:
+            logger.error("Error updating global idea state: %s", e, exc_info=True)
+            raise
         
-    def get_global_idea_state(self) -> GlobalIdeaState:
+    def get_global_idea_state(self, session_id: str) -> GlobalIdeaState:
         """
-        Thread-safe getter for the current global idea state.
-        Returns a copy to prevent external modifications.
+        Getter for a session's current global idea state.
+        GlobalIdeaState is frozen, so the current instance is returned without copying.
         
-        This method should be used when you need to read the state in a thread-safe manner.
         For background jobs or long-running operations, use get_global_idea_state_snapshot()
         to get an immutable snapshot.
         
         Returns:
-            GlobalIdeaState instance (copy)
+            GlobalIdeaState instance
         """
-        with self._state_lock:
-            # Return a copy to prevent external modifications
-            # This ensures thread safety even if the returned object is modified elsewhere
-            return GlobalIdeaState.model_validate(self.global_idea_state.model_dump())
+        # Attribute reads are atomic; updates always rebind to a new instance
+        return self._session(session_id).state
     
-    def get_global_idea_state_snapshot(self) -> GlobalIdeaState:
+    def get_global_idea_state_snapshot(self, session_id: str) -> GlobalIdeaState:
         """
-        Get an immutable snapshot of the global idea state for background jobs.
+        Get an immutable snapshot of a session's global idea state for background jobs.
         
         This is the recommended method for passing state to background threads,
         as it ensures the state won't change during the background operation.
@@ -568,38 +701,51 @@ class Workflow:
         Returns:
             GlobalIdeaState instance (immutable snapshot)
         """
-        with self._state_lock:
-            # Create a deep copy to ensure complete immutability
-            return GlobalIdeaState.model_validate(self.global_idea_state.model_dump())
+        # Frozen instances are never modified in place, so the current one is already a snapshot
+        return self._session(session_id).state
     
-    def set_global_idea_state(self, new_state: GlobalIdeaState) -> None:
+    def set_global_idea_state(self, session_id: str, new_state: GlobalIdeaState) -> None:
         """
-        Thread-safe setter for the global idea state.
+        Setter for a session's global idea state.
         Replaces the entire state atomically.
         
         Args:
+            session_id: Session whose state is replaced
             new_state: New GlobalIdeaState instance to set
         """
-        with self._state_lock:
-            # Create a copy to ensure we don't hold a reference to external state
-            self.global_idea_state = GlobalIdeaState.model_validate(new_state.model_dump())
-            logger.debug("Global idea state replaced")
+        session = self._session(session_id)
+        # Frozen instances can be held directly without copying
+        session.state = new_state
+        session.version += 1
+        logger.debug("Global idea state replaced")
     
-    def update_global_idea_state_field(self, field_name: str, value: Any) -> None:
+    def update_global_idea_state_field(self, session_id: str, field_name: str, value: Any) -> None:
         """
-        Thread-safe update of a single field in the global idea state.
+        Update a single field in a session's global idea state.
         
         Args:
+            session_id: Session whose state is updated
             field_name: Name of the field to update
             value: New value for the field
         """
-        with self._state_lock:
-            try:
-                current_state_dict = self.global_idea_state.model_dump()
-                current_state_dict[field_name] = value
-                self.global_idea_state = GlobalIdeaState.model_validate(current_state_dict, strict=False)
-                logger.debug(f"Updated global idea state field '{field_name}'")
-            except Exception as e:
-                logger.error(f"Error updating global idea state field '{field_name}': {e}", exc_info=True)
-                raise
+        session = self._session(session_id)
+        try:
+            if field_name not in _STATE_FIELDS:
+                logger.debug("Ignoring unknown global idea state field '%s'", field_name)
+                return
+
+            # Only nested-model fields need validation (e.g. user_preferences dicts)
+            if field_name in _NESTED_STATE_FIELDS:
+                validated = GlobalIdeaState.model_validate({field_name: value}, strict=False)
+                value = getattr(validated, field_name)
+
+            if value == getattr(session.state, field_name):
+                return
+
+            session.state = session.state.model_copy(update={field_name: value})
+            session.version += 1
+            logger.debug("Updated global idea state field '%s'", field_name)
+        except Exception as e:
+            logger.error("Error updating global idea state field '%s': %s", field_name, e, exc_info=True)
+            raise
     
\ No newline at end of file
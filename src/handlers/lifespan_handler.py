@@ -1,4 +1,5 @@
 from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI
 import os
 from dotenv import load_dotenv
@@ -22,28 +23,45 @@ async def lifespan(app: FastAPI):
     Cleanly close DB pool on shutdown.
     """
 
-    # Initialize database
-    try:
+    def init_db() -> NeonDB:
         db = NeonDB()
-        # Initialize database schemas (create tables if they don't exist)
-        db.init_chat_schema()
-        db.init_idea_state_schema()
-        app.state.db = db
-        logger.info("Database initialized successfully.")
-    except Exception as exc:
-        logger.exception("Failed to initialize database: %s", exc)
-        app.state.db = None
+        # Initialize database schemas (create tables if they don't exist), bypassing the pooler if possible
+        with db.direct_connection():
+            db.init_chat_schema()
+            db.init_idea_state_schema()
+        return db
+
+    def init_model():
+        return OpenAILLM().get_llm_model()
 
     # Initialize the model and agent here to avoid import-time failures.
     openai_key = os.getenv("OPENAI_API_KEY")
     
+    # DB setup and model setup are independent blocking calls - run them concurrently
+    db_result, model_result = await asyncio.gather(
+        asyncio.to_thread(init_db),
+        asyncio.to_thread(init_model) if openai_key else asyncio.sleep(0),
+        return_exceptions=True,
+    )
+
+    # Initialize database
+    if isinstance(db_result, Exception):
+        logger.error("Failed to initialize database: %s", db_result, exc_info=db_result)
+        db = app.state.db = None
+    else:
+        db = app.state.db = db_result
+        # The async pool (used for message writes) has to be opened from the event loop
+        await db.open_async()
+        logger.info("Database initialized successfully.")
+    
     if not openai_key:
         logger.error("OPENAI_API_KEY not found in environment. The workflow will not be available.")
         app.state.workflow = None
     else:
         try:
-            model = OpenAILLM().get_llm_model()
-            workflow = Workflow(model=model, db=db)
+            if isinstance(model_result, Exception):
+                raise model_result
+            workflow = Workflow(model=model_result, db=db)
 
             app.state.workflow = workflow
             logger.info("Workflow initialized successfully.")
@@ -52,11 +70,19 @@ async def lifespan(app: FastAPI):
             
     yield  # App runs here
     
+    # Flush message saves still in flight before the pool goes away
+    workflow = getattr(app.state, "workflow", None)
+    if workflow is not None:
+        try:
+            await workflow.drain_background_tasks()
+        except Exception as exc:
+            logger.exception("Error flushing background saves: %s", exc)
+    
     # Cleanup: close database pool
     if hasattr(app.state, "db") and app.state.db:
         try:
-            app.state.db.pool.close()
-            logger.info("Database pool closed.")
+            await app.state.db.close_async()
+            logger.info("Database pools closed.")
         except Exception as exc:
             logger.exception("Error closing database pool: %s", exc)
     
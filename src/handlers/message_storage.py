@@ -3,73 +3,241 @@ Message storage operations for saving and fetching chat messages from the databa
 """
 import logging
 import asyncio
-import uuid
-import json
+import functools
+import orjson
 import random
-from typing import Optional, List, Dict
+import time
+from contextvars import ContextVar
+from operator import attrgetter
+from typing import Awaitable, Callable, Iterable, Optional, List, Dict, Tuple, TypeVar, Union
 from langchain_core.messages import HumanMessage, AIMessage
 from src.models.chat_transfer_model import ChatResponse, ChatRequest
 from src.models.chat_message_model import ChatMessageModel
 from src.states.global_idea_state import GlobalIdeaState
+from src.utils.uuid_pool import UUID_POOL
 import psycopg
 import psycopg_pool
 
 logger = logging.getLogger(__name__)
 
+# Keys of a structured response that belong to the idea state
+_GLOBAL_STATE_FIELDS = frozenset(GlobalIdeaState.model_fields)
 
-async def save_user_message(chat_request: ChatRequest, db, stage: int) -> bool:
+# First assistant message of a new session
+WELCOME_MESSAGE = "Hey! 👋 Welcome to SprintPlanner. Tell me about the idea you're excited to build — even a rough thought is enough. Let's shape it together."
+# Fields of the message a new session is seeded with (chat_id, metadata and timestamps are per session)
+_WELCOME_FIELDS = {"role": "assistant", "content": WELCOME_MESSAGE, "stage": 1}
+# Metadata key marking the seeded welcome row; backs the database's one-seed-per-session
+# index and is stripped before messages are returned to clients
+_WELCOME_MARKER = "welcome"
+
+# Request-scoped cache of session messages: session_id -> (loaded_at, messages).
+# Lets the several readers of one request share a single DB fetch.
+MESSAGE_CACHE_TTL_SECONDS = 2.0
+_message_cache: ContextVar[Optional[Dict[str, Tuple[float, List[ChatMessageModel]]]]] = ContextVar(
+    "msg_cache", default=None
+)
+
+
+def _get_cached_messages(session_id: str) -> Optional[List[ChatMessageModel]]:
+    """Return the cached messages for a session if they are still fresh."""
+    cache = _message_cache.get()
+    if not cache:
+        return None
+    entry = cache.get(session_id)
+    if entry is None:
+        return None
+    loaded_at, messages = entry
+    if time.monotonic() - loaded_at > MESSAGE_CACHE_TTL_SECONDS:
+        del cache[session_id]
+        return None
+    return messages
+
+
+def _set_cached_messages(session_id: str, messages: List[ChatMessageModel]) -> None:
+    cache = _message_cache.get()
+    if cache is None:
+        cache = {}
+        _message_cache.set(cache)
+    cache[session_id] = (time.monotonic(), messages)
+
+
+def invalidate_session_messages(session_id: str) -> None:
+    """Drop the cached messages of a session (called after every write)."""
+    cache = _message_cache.get()
+    if cache:
+        cache.pop(session_id, None)
+
+
+# Retry backoff: short first wait for one-off blips, capped for persistent outages
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 2.0
+# Keepalives and max_idle keep pooled connections fresh, so one retry covers a connection that died
+MAX_DB_ATTEMPTS = 2
+# No retry is started past this long after the first attempt (e.g. after a slow pool timeout)
+RETRY_DEADLINE_SECONDS = 2.0
+_CONNECTION_ERRORS = (psycopg.OperationalError, psycopg.InterfaceError, psycopg_pool.PoolTimeout)
+
+T = TypeVar("T")
+
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so reconnecting requests don't retry in lockstep."""
+    return random.uniform(RETRY_BASE_DELAY, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 3 ** (attempt + 1)))
+
+
+async def _with_retry(
+    operation: Callable[[], Awaitable[T]],
+    description: str,
+) -> T:
     """
-    Save user message to database with retry logic and connection error handling.
+    Run a DB operation, retrying connection errors after a jittered backoff.
+    Retries stop after MAX_DB_ATTEMPTS or once the next one would start after RETRY_DEADLINE_SECONDS;
+    the last connection error (or any other error) is raised to the caller.
+    
+    Args:
+        operation: Zero-argument callable returning the awaitable to run
+        description: What is being done (used in log messages), e.g. "fetching messages"
+    
+    Returns:
+        The operation's result
+    """
+    deadline = time.monotonic() + RETRY_DEADLINE_SECONDS
+    for attempt in range(MAX_DB_ATTEMPTS):
+        try:
+            return await operation()
+        except _CONNECTION_ERRORS as e:
+            wait_time = _retry_delay(attempt)
+            if attempt == MAX_DB_ATTEMPTS - 1 or time.monotonic() + wait_time > deadline:
+                raise
+            logger.warning(
+                "Database connection error %s (attempt %d/%d): %s. Retrying in %.2fs...",
+                description, attempt + 1, MAX_DB_ATTEMPTS, e, wait_time
+            )
+            await asyncio.sleep(wait_time)
+    raise AssertionError("unreachable")
+
+
+async def _write_with_retry(
+    db,
+    write: Callable[[], Awaitable[object]],
+    description: str,
+    session_ids: Iterable[str],
+) -> bool:
+    """
+    Run an async DB write with retry logic and connection error handling.
     
     Args:
-        chat_request: The chat request containing user message
         db: Database instance
+        write: Zero-argument callable returning the insert awaitable
+        description: What is being saved (used in log messages)
+        session_ids: Sessions whose cached messages become stale on success
+    
+    Returns:
+        bool: True if saved successfully, False otherwise
+    """
+    try:
+        await _with_retry(write, "saving " + description)
+    except _CONNECTION_ERRORS as e:
+        logger.error("Failed to save %s after retrying: %s", description, e, exc_info=True)
+        return False
+    except Exception as e:
+        logger.error("Error saving %s to DB: %s", description, e, exc_info=True)
+        return False
+    
+    for session_id in session_ids:
+        invalidate_session_messages(session_id)
+    return True
+
+
+def build_user_message(chat_request: ChatRequest, stage: int) -> ChatMessageModel:
+    """
+    Build the ChatMessageModel for the user message of a chat request.
+    
+    Args:
+        chat_request: The chat request containing user message
+        stage: The idea state stage (1-9)
+    
+    Returns:
+        ChatMessageModel ready to be saved
+    """
+    return ChatMessageModel(
+        chat_id=UUID_POOL.next(),
+        session_id=chat_request.session_id,
+        user_id=chat_request.user_id,
+        role="user",
+        content=chat_request.user_message,
+        metadata={},
+        stage=stage
+    )
+
+
+def build_agent_message(
+    session_id: str,
+    user_id: Optional[str],
+    content: str,
+    stage: int,
+    formatted_output: Optional[str] = None
+) -> ChatMessageModel:
+    """
+    Build the ChatMessageModel for an agent response.
+    
+    Args:
+        session_id: The session ID
+        user_id: Optional user ID
+        content: The agent response content
         stage: The idea state stage (1-9)
+        formatted_output: the formatted output of the agent
+    
+    Returns:
+        ChatMessageModel ready to be saved
+    """
+    return ChatMessageModel(
+        chat_id=UUID_POOL.next(),
+        session_id=session_id,
+        user_id=user_id,
+        role="assistant",
+        content=content,
+        formatted_output=formatted_output,
+        metadata={},
+        stage=stage
+    )
+
+
+async def save_chat_message(message: ChatMessageModel, db) -> bool:
+    """
+    Save a single prepared message to database.
+    
+    Args:
+        message: The message to save
+        db: Database instance
     
     Returns:
         bool: True if saved successfully, False otherwise
     """
-    if not db or not chat_request.user_message:
+    if not db:
         return False
     
-    max_retries = 3
-    base_retry_delay = 0.5
+    description = "user message" if message.role == "user" else "agent response"
+    return await _write_with_retry(db, lambda: db.insert_chat_messages_async([message]), description, (message.session_id,))
+
+
+async def save_chat_messages(messages: List[ChatMessageModel], db) -> bool:
+    """
+    Save prepared messages (possibly of several sessions) with a single multi-row INSERT, in list order.
     
-    for attempt in range(max_retries):
-        try:
-            user_message = ChatMessageModel(
-                chat_id=uuid.uuid4(),
-                session_id=chat_request.session_id,
-                user_id=chat_request.user_id,
-                role="user",
-                content=chat_request.user_message,
-                metadata={},
-                stage=stage
-            )
-            db.create_chat_message(user_message)
-            return True
-        except (psycopg.OperationalError, psycopg.InterfaceError, psycopg_pool.PoolTimeout) as e:
-            if attempt < max_retries - 1:
-                # Exponential backoff with jitter
-                wait_time = base_retry_delay * (2 ** attempt) + random.uniform(0, 0.1)
-                logger.warning(
-                    f"Database connection error saving user message (attempt {attempt + 1}/{max_retries}): {e}. "
-                    f"Retrying in {wait_time:.2f}s..."
-                )
-                await asyncio.sleep(wait_time)
-                # Try to reconnect pool if it's closed
-                if hasattr(db, 'pool') and hasattr(db.pool, 'check'):
-                    try:
-                        db.pool.check()
-                    except Exception:
-                        pass
-            else:
-                logger.error(f"Failed to save user message after {max_retries} attempts: {e}", exc_info=True)
-        except Exception as e:
-            logger.error(f"Error saving user message to DB: {e}", exc_info=True)
-            break  # Don't retry for non-connection errors
+    Args:
+        messages: The messages to save
+        db: Database instance
+    
+    Returns:
+        bool: True if saved successfully, False otherwise
+    """
+    if not db or not messages:
+        return False
     
-    return False
+    session_ids = {message.session_id for message in messages}
+    return await _write_with_retry(db, lambda: db.insert_chat_messages_async(messages), "chat messages", session_ids)
 
 
 async def save_agent_message(
@@ -97,50 +265,16 @@ async def save_agent_message(
     if not db or not content:
         return False
     
-    max_retries = 3
-    base_retry_delay = 0.5
-    
-    for attempt in range(max_retries):
-        try:
-            agent_message = ChatMessageModel(
-                chat_id=uuid.uuid4(),
-                session_id=session_id,
-                user_id=user_id,
-                role="assistant",
-                content=content,
-                formatted_output=formatted_output,
-                metadata={},
-                stage=stage
-            )
-            db.create_chat_message(agent_message)
-            return True
-        except (psycopg.OperationalError, psycopg.InterfaceError, psycopg_pool.PoolTimeout) as e:
-            if attempt < max_retries - 1:
-                # Exponential backoff with jitter
-                wait_time = base_retry_delay * (2 ** attempt) + random.uniform(0, 0.1)
-                logger.warning(
-                    f"Database connection error saving agent response (attempt {attempt + 1}/{max_retries}): {e}. "
-                    f"Retrying in {wait_time:.2f}s..."
-                )
-                await asyncio.sleep(wait_time)
-                # Try to reconnect pool if it's closed
-                if hasattr(db, 'pool') and hasattr(db.pool, 'check'):
-                    try:
-                        db.pool.check()
-                    except Exception:
-                        pass
-            else:
-                logger.error(f"Failed to save agent response after {max_retries} attempts: {e}", exc_info=True)
-        except Exception as e:
-            logger.error(f"Error saving agent response to DB: {e}", exc_info=True)
-            break  # Don't retry for non-connection errors
-    
-    return False
+    agent_message = build_agent_message(session_id, user_id, content, stage, formatted_output)
+    return await save_chat_message(agent_message, db)
 
 
+@functools.lru_cache(maxsize=1024)
 def parse_formatted_output(formatted_output: str) -> Optional[Dict]:
     """
     Parse formatted_output JSON string to dictionary.
+    Results are memoized by string (a session's outputs are re-parsed on every reconnect),
+    so the returned dictionary is shared and must not be mutated.
     
     Args:
         formatted_output: JSON string to parse
@@ -152,17 +286,17 @@ def parse_formatted_output(formatted_output: str) -> Optional[Dict]:
         return None
     
     try:
-        parsed = json.loads(formatted_output)
+        parsed = orjson.loads(formatted_output)
         if isinstance(parsed, dict):
             return parsed
         else:
-            logger.warning(f"Formatted output is not a dictionary: {type(parsed)}")
+            logger.warning("Formatted output is not a dictionary: %s", type(parsed))
             return None
-    except json.JSONDecodeError as e:
-        logger.error(f"Error parsing formatted_output JSON: {e}")
+    except orjson.JSONDecodeError as e:
+        logger.error("Error parsing formatted_output JSON: %s", e)
         return None
     except Exception as e:
-        logger.error(f"Unexpected error parsing formatted_output: {e}", exc_info=True)
+        logger.error("Unexpected error parsing formatted_output: %s", e, exc_info=True)
         return None
 
 
@@ -176,7 +310,8 @@ def extract_state_from_formatted_output(formatted_output: Optional[str]) -> Opti
     Returns:
         State value ("ongoing" or "completed") or None if not found/invalid
     """
-    if not formatted_output:
+    # Neither state value appears in the text, so there is nothing to parse for
+    if not formatted_output or ('"completed"' not in formatted_output and '"ongoing"' not in formatted_output):
         return None
     
     parsed = parse_formatted_output(formatted_output)
@@ -190,6 +325,28 @@ def extract_state_from_formatted_output(formatted_output: Optional[str]) -> Opti
     return None
 
 
+def parse_message_outputs(messages: List[Dict]) -> List[Optional[Dict]]:
+    """
+    Parse the formatted_output of every assistant message that may be completed, once.
+    Only completed outputs are read downstream, so outputs without a "completed" string are not parsed.
+    
+    Args:
+        messages: List of message dictionaries with formatted_output
+        
+    Returns:
+        List aligned with messages: the parsed dict, or None for user messages, outputs that
+        can't be completed and missing/invalid output
+    """
+    parsed_outputs = []
+    for msg in messages:
+        formatted_output = msg.get("formatted_output")
+        if msg.get("role") == "assistant" and formatted_output and '"completed"' in formatted_output:
+            parsed_outputs.append(parse_formatted_output(formatted_output))
+        else:
+            parsed_outputs.append(None)
+    return parsed_outputs
+
+
 def update_global_state_from_messages(messages: List[Dict]) -> GlobalIdeaState:
     """
     Update global idea state from completed messages.
@@ -197,7 +354,20 @@ def update_global_state_from_messages(messages: List[Dict]) -> GlobalIdeaState:
     
     Args:
         messages: List of message dictionaries with formatted_output
-        global_state: GlobalIdeaState instance to update
+        
+    Returns:
+        Updated GlobalIdeaState instance
+    """
+    return update_global_state_from_parsed(messages, parse_message_outputs(messages))
+
+
+def update_global_state_from_parsed(messages: List[Dict], parsed_outputs: List[Optional[Dict]]) -> GlobalIdeaState:
+    """
+    Update global idea state from completed messages whose formatted_output is already parsed.
+    
+    Args:
+        messages: List of message dictionaries
+        parsed_outputs: Parsed formatted_output per message (see parse_message_outputs)
         
     Returns:
         Updated GlobalIdeaState instance
@@ -206,82 +376,93 @@ def update_global_state_from_messages(messages: List[Dict]) -> GlobalIdeaState:
         return GlobalIdeaState()
     
     try:
-        
-        global_state = GlobalIdeaState()
-        
-        
-        for msg in messages:
-            # Only process assistant messages with formatted_output
-            if msg.get("role") != "assistant":
-                continue
-            
-            formatted_output = msg.get("formatted_output")
-            if not formatted_output:
-                continue
-            
-            # Parse and check if state is completed
-            parsed_output = parse_formatted_output(formatted_output)
-            if not parsed_output:
+        # Merge the completed outputs as plain dicts and validate once at the end.
+        # Later outputs win, so scan from the end and keep the first value seen per field;
+        # stop early once every field is set.
+        merged_state: Dict = {}
+        for parsed_output in reversed(parsed_outputs):
+            # Only process assistant messages with a parsed, completed formatted_output
+            if not parsed_output or parsed_output.get("state") != "completed":
                 continue
             
-            state = parsed_output.get("state")
-            
-            if state != "completed":
+            # Skip None values from parsed_output to avoid overwriting existing values
+            # Only take fields of the state model that have actual values (not None)
+            for key, value in parsed_output.items():
+                if value is not None and key in _GLOBAL_STATE_FIELDS and key not in merged_state:
+                    merged_state[key] = value
+            if len(merged_state) == len(_GLOBAL_STATE_FIELDS):
+                break
+        
+        try:
+            return GlobalIdeaState.model_validate(merged_state, strict=False)
+        except Exception as e:
+            logger.warning("Error validating merged global state, applying messages one by one: %s", e)
+        
+        # Slow path: apply each completed message on its own so one invalid output doesn't discard the rest
+        global_state = GlobalIdeaState()
+        for msg, parsed_output in zip(messages, parsed_outputs):
+            if not parsed_output or parsed_output.get("state") != "completed":
                 continue
-            
-            # Update global state with the structured response
+            updates = {k: v for k, v in parsed_output.items() if v is not None and k in _GLOBAL_STATE_FIELDS}
             try:
-                # Get current state as dict
-                current_state_dict = global_state.model_dump()
-                
-                # Filter out None values from parsed_output to avoid overwriting existing values
-                # Only update fields that have actual values (not None)
-                updates = {k: v for k, v in parsed_output.items() if v is not None}
-                
-                # Merge updates into current state
-                merged_state = {**current_state_dict, **updates}
-                
-                # Create new state instance from merged dict
-                global_state = GlobalIdeaState.model_validate(merged_state, strict=False)
-                logger.debug(f"Updated global state from stage {msg.get('stage')} completed message")
+                global_state = GlobalIdeaState.model_validate(
+                    {**global_state.model_dump(), **updates}, strict=False
+                )
+                logger.debug("Updated global state from stage %s completed message", msg.get("stage"))
             except Exception as e:
-                logger.warning(f"Error updating global state from message: {e}")
+                logger.warning("Error updating global state from message: %s", e)
             
         return global_state
         
     except Exception as e:
-        logger.error(f"Error updating global state from messages: {e}", exc_info=True)
+        logger.error("Error updating global state from messages: %s", e, exc_info=True)
         return GlobalIdeaState()
 
 
-def determine_current_stage(messages: List[Dict]) -> int:
+def _stage_and_role(message: Union[ChatMessageModel, Dict]) -> Tuple[Optional[int], Optional[str]]:
+    """Read stage and role from a ChatMessageModel or a message dict."""
+    if isinstance(message, ChatMessageModel):
+        return message.stage, message.role
+    return message.get("stage"), message.get("role")
+
+
+def determine_current_stage(last_message: Optional[Union[ChatMessageModel, Dict]]) -> int:
+    """
+        Determine the current stage based on the last message of a session (None if it has none).
+        Handles both dictionary messages and Pydantic model objects.
+    """
+    if not last_message:
+        return 1
+    
+    stage, role = _stage_and_role(last_message)
+    # Only the completion of stage 8 depends on the output, so only then is it parsed
+    last_parsed_output = None
+    if stage == 8 and role == "assistant":
+        formatted_output = (
+            last_message.formatted_output if isinstance(last_message, ChatMessageModel)
+            else last_message.get("formatted_output")
+        )
+        last_parsed_output = parse_formatted_output(formatted_output)
+    return determine_current_stage_from_parsed(last_message, last_parsed_output)
+
+
+def determine_current_stage_from_parsed(
+    last_message: Optional[Union[ChatMessageModel, Dict]],
+    last_parsed_output: Optional[Dict],
+) -> int:
     """
-        Determine the current stage based on the last message.
+        Determine the current stage based on the last message and its already parsed formatted_output.
         Handles both dictionary messages and Pydantic model objects.
     """
     try:
-        # Check if messages list is empty
-        if not messages:
+        # Check if the session has no messages
+        if not last_message:
             return 1
         
-        last_message = messages[-1]
-        
-        last_message_stage = 0
-        
-        # instance of ChatMessageModel
-        if isinstance(last_message, ChatMessageModel):
-            last_message_stage = last_message.stage
-            role = last_message.role
-            formatted_output = last_message.formatted_output
-        else:
-            # dict
-            last_message_stage = last_message.get("stage")
-            role = last_message.get("role")
-            formatted_output = last_message.get("formatted_output")
+        last_message_stage, role = _stage_and_role(last_message)
         
         if last_message_stage == 8 and role == "assistant":
-            parsed_output = parse_formatted_output(formatted_output)
-            if parsed_output and parsed_output.get("state") == "completed":
+            if last_parsed_output and last_parsed_output.get("state") == "completed":
                 return 9
             else:
                 return 8
@@ -292,9 +473,40 @@ def determine_current_stage(messages: List[Dict]) -> int:
         return last_message_stage if last_message_stage is not None else 1
         
     except Exception as e:
-        logger.error(f"Error determining current stage: {e}", exc_info=True)
+        logger.error("Error determining current stage: %s", e, exc_info=True)
         return 1
 
+# Attributes of ChatMessageModel copied into the ChatResponse message dicts, fetched in one call
+_MESSAGE_FIELDS = attrgetter(
+    "role", "content", "metadata", "chat_id", "stage", "formatted_output", "created_at", "updated_at"
+)
+
+
+def _public_metadata(metadata: Optional[Dict]) -> Optional[Dict]:
+    """Message metadata without the internal welcome marker."""
+    if metadata and _WELCOME_MARKER in metadata:
+        return {key: value for key, value in metadata.items() if key != _WELCOME_MARKER}
+    return metadata
+
+
+def _messages_to_dicts(chat_messages: List[ChatMessageModel]) -> List[Dict]:
+    """Convert ChatMessageModel rows to the dict format used by ChatResponse."""
+    return [
+        {
+            "role": role,
+            "content": content,
+            "metadata": _public_metadata(metadata),
+            "chat_id": str(chat_id),
+            "stage": stage,
+            "formatted_output": formatted_output,
+            "created_at": created_at.isoformat() if created_at else None,
+            "updated_at": updated_at.isoformat() if updated_at else None
+        }
+        for role, content, metadata, chat_id, stage, formatted_output, created_at, updated_at
+        in map(_MESSAGE_FIELDS, chat_messages)
+    ]
+
+
 async def fetch_session_messages(
     session_id: str,
     db,
@@ -316,175 +528,94 @@ async def fetch_session_messages(
     if not db:
         return (None, GlobalIdeaState())
     
-    max_retries = 3
-    base_retry_delay = 0.5
+    async def load_messages() -> List[ChatMessageModel]:
+        chat_messages = _get_cached_messages(session_id)
+        if not chat_messages:
+            # A new session is seeded with the welcome message in the same round-trip
+            # The welcome marker lets the database keep a single seed when requests race
+            welcome_message = ChatMessageModel(session_id=session_id, metadata={_WELCOME_MARKER: True}, **_WELCOME_FIELDS)
+            chat_messages = db.get_or_seed_chat_messages(session_id, welcome_message)
+            _set_cached_messages(session_id, chat_messages)
+        return chat_messages
     
-    for attempt in range(max_retries):
-        try:
-            chat_messages = db.get_chat_messages_by_session(session_id)
-            # Convert ChatMessageModel to dict format for ChatResponse
-            # Skip messages with content "Stage completed"
-            messages_list = [
-                {
-                    "role": msg.role,
-                    "content": msg.content,
-                    "metadata": msg.metadata,
-                    "chat_id": str(msg.chat_id),
-                    "stage": msg.stage,
-                    "formatted_output": msg.formatted_output,
-                    "created_at": msg.created_at.isoformat() if msg.created_at else None,
-                    "updated_at": msg.updated_at.isoformat() if msg.updated_at else None
-                }
-                for msg in chat_messages
-            ]
-            
-            # Update global state from completed messages if provided
-            global_state = update_global_state_from_messages(messages_list)
-            logger.debug(f"Updated global state from messages for session {session_id}")
-            
-            # Determine current stage based on completed states
-            current_stage = determine_current_stage(messages_list)
-            
-            if len(messages_list) == 0:
-                await save_agent_message(
-                    session_id,
-                    None,
-                    "Hey! 👋 Welcome to SprintPlanner. Tell me about the idea you're excited to build — even a rough thought is enough. Let's shape it together.",
-                    db,
-                    current_stage
-                )
-                messages_list = [
-                    {
-                        "role": "assistant",
-                        "content": "Hey! 👋 Welcome to SprintPlanner. Tell me about the idea you're excited to build — even a rough thought is enough. Let's shape it together.",
-                        "metadata": {},
-                        "chat_id": str(uuid.uuid4()),
-                        "stage": current_stage
-                    }
-                ]
-            
-            return (ChatResponse(
-                connection_status="started",
-                messages=[msg for msg in messages_list if msg.get("content") != "Stage completed"],
-                idea_state_stage=current_stage
-            ), global_state)
-            
-        except (psycopg.OperationalError, psycopg.InterfaceError, psycopg_pool.PoolTimeout) as e:
-            if attempt < max_retries - 1:
-                # Exponential backoff with jitter
-                wait_time = base_retry_delay * (2 ** attempt) + random.uniform(0, 0.1)
-                logger.warning(
-                    f"Database connection error fetching messages (attempt {attempt + 1}/{max_retries}): {e}. "
-                    f"Retrying in {wait_time:.2f}s..."
-                )
-                await asyncio.sleep(wait_time)
-                # Try to reconnect pool if it's closed
-                if hasattr(db, 'pool') and hasattr(db.pool, 'check'):
-                    try:
-                        db.pool.check()
-                    except Exception:
-                        pass
-            else:
-                logger.error(
-                    f"Failed to fetch messages from DB after {max_retries} attempts: {e}",
-                    exc_info=True
-                )
-                # Return empty messages list to continue
-                return (ChatResponse(
-                    connection_status="started",
-                    messages=[],
-                    idea_state_stage=idea_state_stage if idea_state_stage is not None else 1
-                ), GlobalIdeaState())
-        except Exception as e:
-            logger.error(f"Error fetching messages from DB: {e}", exc_info=True)
-            # Return empty messages list to continue
-            return (ChatResponse(
-                connection_status="started",
-                messages=[],
-                idea_state_stage=idea_state_stage if idea_state_stage is not None else 1
-            ), GlobalIdeaState())
+    try:
+        chat_messages = await _with_retry(load_messages, "fetching messages")
+        # Convert ChatMessageModel to dict format for ChatResponse
+        messages_list = _messages_to_dicts(chat_messages)
+        
+        # Parse each formatted_output once; shared by the state rebuild and stage detection
+        parsed_outputs = parse_message_outputs(messages_list)
+        
+        # Update global state from completed messages if provided
+        global_state = update_global_state_from_parsed(messages_list, parsed_outputs)
+        logger.debug("Updated global state from messages for session %s", session_id)
+        
+        # Determine current stage based on completed states
+        current_stage = determine_current_stage_from_parsed(
+            messages_list[-1] if messages_list else None, parsed_outputs[-1] if parsed_outputs else None
+        )
+        
+        # The message dicts are built here from validated rows, so skip re-validating
+        # (and copying) every one of them in ChatResponse.
+        # Skip messages with content "Stage completed"
+        return (ChatResponse.model_construct(
+            connection_status="started",
+            messages=[msg for msg in messages_list if msg["content"] != "Stage completed"],
+            idea_state_stage=current_stage
+        ), global_state)
+        
+    except _CONNECTION_ERRORS as e:
+        logger.error(
+            "Failed to fetch messages from DB after retrying: %s", e,
+            exc_info=True
+        )
+    except Exception as e:
+        logger.error("Error fetching messages from DB: %s", e, exc_info=True)
     
+    # Return empty messages list to continue
     return (ChatResponse(
         connection_status="started",
         messages=[],
-        idea_state_stage=idea_state_stage
+        idea_state_stage=idea_state_stage if idea_state_stage is not None else 1
     ), GlobalIdeaState())
 
 
-async def get_conversation_history(session_id: str, db) -> List:
-    """
-    Fetch all previous messages for a session and convert them to LangChain message format.
-    
-    Args:
-        session_id: The session ID to fetch messages for
-        db: Database instance
-    
-    Returns:
-        List of LangChain messages (HumanMessage/AIMessage) in chronological order
-    """
-    if not db:
-        return []
-    
-    try:
-        chat_messages = db.get_chat_messages_by_session(session_id)
-        langchain_messages = []
-        
-        for msg in chat_messages:
-            if msg.role == "user":
-                langchain_messages.append(HumanMessage(content=msg.content))
-            elif msg.role == "assistant":
-                if msg.formatted_output:
-                    langchain_messages.append(AIMessage(content=msg.formatted_output))
-                else:
-                    langchain_messages.append(AIMessage(content=msg.content))
-        
-        logger.debug(f"Converted {len(langchain_messages)} messages to LangChain format for session {session_id}")
-        return langchain_messages
-    except Exception as e:
-        logger.error(f"Error fetching conversation history: {e}", exc_info=True)
-        return []
+# LangChain message class per stored role
+_LANGCHAIN_MESSAGE_CLASSES = {"user": HumanMessage, "assistant": AIMessage}
+
+
+def _to_langchain_message(msg: ChatMessageModel):
+    """Convert one stored chat message to a LangChain message, or None for an unknown role."""
+    message_class = _LANGCHAIN_MESSAGE_CLASSES.get(msg.role)
+    if message_class is None:
+        logger.warning("Unknown role %s for message in session %s, skipping", msg.role, msg.session_id)
+        return None
+    content = msg.formatted_output if message_class is AIMessage and msg.formatted_output else msg.content
+    return message_class(content=content)
 
 
-async def get_conversation_history_by_stage(session_id: str, stage: int, db) -> List:
+def to_langchain_messages(chat_messages: Iterable[ChatMessageModel]) -> List:
     """
-    Fetch messages for a session matching a specific stage and convert them to LangChain message format.
+    Convert stored chat messages to LangChain messages.
+    Assistant messages carry their formatted_output when present; unknown roles are skipped.
     
     Args:
-        session_id: The session ID to fetch messages for
-        stage: The stage number to filter messages by (1-9)
-        db: Database instance
+        chat_messages: Messages in chronological order
     
     Returns:
-        List of LangChain messages (HumanMessage/AIMessage) in chronological order, filtered by stage
+        List of LangChain messages (HumanMessage/AIMessage)
     """
-    if not db:
-        return []
-    
-    try:
-        chat_messages = db.get_chat_messages_by_session(session_id)
-        langchain_messages = []
-        
-        # Filter messages by stage
-        for msg in chat_messages:
-            if msg.stage == stage:
-                if msg.role == "user":
-                    langchain_messages.append(HumanMessage(content=msg.content))
-                elif msg.role == "assistant":
-                    if msg.formatted_output:
-                        langchain_messages.append(AIMessage(content=msg.formatted_output))
-                    else:
-                        langchain_messages.append(AIMessage(content=msg.content))
-        
-        logger.debug(f"Converted {len(langchain_messages)} messages to LangChain format for session {session_id} at stage {stage}")
-        return langchain_messages
-    except Exception as e:
-        logger.error(f"Error fetching conversation history by stage: {e}", exc_info=True)
-        return []
+    langchain_messages = []
+    for msg in chat_messages:
+        langchain_message = _to_langchain_message(msg)
+        if langchain_message is not None:
+            langchain_messages.append(langchain_message)
+    return langchain_messages
 
 
 async def get_last_stage_messages(session_id: str, db) -> tuple:
     """
-    Fetch all messages for a session and return all messages from the last stage with its stage number.
+    Fetch the messages of a session's last stage and return them with its stage number.
     
     Args:
         session_id: The session ID to fetch messages for
@@ -498,39 +629,33 @@ async def get_last_stage_messages(session_id: str, db) -> tuple:
         return ([], 1)
     
     try:
-        chat_messages = db.get_chat_messages_by_session(session_id)
+        cached_messages = _get_cached_messages(session_id)
+        if cached_messages is not None:
+            # The whole session is already loaded for this request
+            chat_messages = cached_messages
+        else:
+            # Only the latest stage is needed: its last row is the session's last message,
+            # which is all determine_current_stage looks at
+            chat_messages = db.get_last_stage_chat_messages(session_id)
         
         if not chat_messages:
-            logger.debug(f"No messages found for session {session_id}")
+            logger.debug("No messages found for session %s", session_id)
             return ([], 1)
         
-        max_stage = determine_current_stage(chat_messages)
+        max_stage = determine_current_stage(chat_messages[-1])
         last_stage_messages = [msg for msg in chat_messages if msg.stage == max_stage]
         
         if not last_stage_messages:
-            logger.debug(f"No messages found for session {session_id} at stage {max_stage}")
+            logger.debug("No messages found for session %s at stage %s", session_id, max_stage)
             return ([], max_stage)
         
         # Convert all messages from the last stage to LangChain message format
-        langchain_messages = []
-        for msg in last_stage_messages:
-            if msg.role == "user":
-                langchain_message = HumanMessage(content=msg.content)
-                langchain_messages.append(langchain_message)
-            elif msg.role == "assistant":
-                if msg.formatted_output:
-                    langchain_message = AIMessage(content=msg.formatted_output)
-                else:
-                    langchain_message = AIMessage(content=msg.content)
-                langchain_messages.append(langchain_message)
-            else:
-                logger.warning(f"Unknown role {msg.role} for message in session {session_id}, skipping")
-                continue
+        langchain_messages = to_langchain_messages(last_stage_messages)
         
-        logger.info(f"Retrieved {len(langchain_messages)} messages from last stage {max_stage} for session {session_id}")
+        logger.info("Retrieved %d messages from last stage %d for session %s", len(langchain_messages), max_stage, session_id)
         # Return all messages from the last stage
         return (langchain_messages, max_stage)
     except Exception as e:
-        logger.error(f"Error fetching last stage messages: {e}", exc_info=True)
+        logger.error("Error fetching last stage messages: %s", e, exc_info=True)
         return ([], 1)
 
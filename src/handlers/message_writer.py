@@ -0,0 +1,139 @@
+"""
+Background persistence of chat messages.
+Saves are queued and written by a few worker tasks, each flushing its queue with one multi-row insert.
+"""
+import asyncio
+import contextvars
+import logging
+import zlib
+from typing import Any, Dict, List, Tuple
+
+from src.handlers.message_storage import invalidate_session_messages, save_chat_messages
+from src.models.chat_message_model import ChatMessageModel
+
+logger = logging.getLogger(__name__)
+
+# (db, messages saved together and in order, future for the result, context of the submitting request)
+_Pending = Tuple[Any, List[ChatMessageModel], asyncio.Future, contextvars.Context]
+
+
+class MessageWriter:
+    """
+    Bounded write-behind queue for chat messages.
+
+    - Each submit() is stored as one unit, in order, and resolves its future with True/False.
+    - Sessions are sharded over num_workers queues, so one session's writes are never
+      reordered by two workers racing; different sessions are flushed in parallel.
+    - A worker drains up to batch_size queued writes (waiting at most flush_interval_ms
+      for more) and stores them with a single INSERT. If that fails, the writes are retried
+      one by one so a single bad row doesn't lose the others.
+    - When a queue holds maxsize writes, submit() waits for room (backpressure).
+    """
+
+    def __init__(
+        self,
+        num_workers: int = 4,
+        maxsize: int = 1000,
+        batch_size: int = 50,
+        flush_interval_ms: float = 10,
+    ):
+        self.num_workers = num_workers
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_ms / 1000
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    @property
+    def pending(self) -> int:
+        """Number of queued writes not yet picked up by a worker."""
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    async def submit(self, db: Any, messages: List[ChatMessageModel]) -> "asyncio.Future[bool]":
+        """
+        Queue messages of one session for saving and return a future for the result.
+        Awaiting the returned future is optional.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if not db or not messages:
+            future.set_result(False)
+            return future
+
+        shard = zlib.crc32(messages[0].session_id.encode()) % self.num_workers
+        queue = self._queues.get(shard)
+        if queue is None:
+            queue = self._queues[shard] = asyncio.Queue(maxsize=self.maxsize)
+
+        worker = self._workers.get(shard)
+        if worker is None or worker.done():
+            # Workers outlive the request that starts them - don't let them inherit its context
+            self._workers[shard] = asyncio.create_task(
+                self._run(queue),
+                name=f"message-writer-{shard}",
+                context=contextvars.Context(),
+            )
+
+        await queue.put((db, messages, future, contextvars.copy_context()))
+        return future
+
+    async def drain(self) -> None:
+        """Wait until every queued write has been flushed."""
+        await asyncio.gather(*(queue.join() for queue in self._queues.values()))
+
+    async def close(self) -> None:
+        """Flush all queued writes, then stop the workers (call on shutdown)."""
+        await self.drain()
+        workers = list(self._workers.values())
+        self._workers.clear()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        """Worker: collect a batch of queued writes, then flush it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[_Pending] = [await queue.get()]
+            deadline = loop.time() + self.flush_interval_seconds
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logger.error("Error flushing %d queued message writes: %s", len(batch), e, exc_info=True)
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_result(False)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _flush(self, batch: List[_Pending]) -> None:
+        """Store a batch with one INSERT per database, falling back to per-write inserts."""
+        groups: Dict[int, List[_Pending]] = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+
+        for group in groups.values():
+            db = group[0][0]
+            saved = await save_chat_messages([m for _, messages, _, _ in group for m in messages], db)
+            if saved or len(group) == 1:
+                results = [saved] * len(group)
+            else:
+                logger.warning("Batched insert of %d message writes failed, retrying one by one", len(group))
+                results = [await save_chat_messages(messages, db) for _, messages, _, _ in group]
+
+            for (_, messages, future, context), result in zip(group, results):
+                if result:
+                    # The request-scoped message cache lives in the submitter's context
+                    context.run(invalidate_session_messages, messages[0].session_id)
+                if not future.done():
+                    future.set_result(result)
@@ -1,6 +1,8 @@
 import uuid
+import asyncio
 import logging
 import threading
+import time as time_module
 from typing import List, Dict, Any, Tuple, Optional, AsyncGenerator
 
 from datetime import datetime, timedelta, time, timezone
@@ -17,6 +19,10 @@ from src.agents.narrative_agent import NarrativeSectionAgent
 
 logger = logging.getLogger(__name__)
 
+# Documents of a session are reused for this long (e.g. when complete_stage is retried)
+DOCUMENTS_CACHE_TTL_SECONDS = 60.0
+DOCUMENTS_CACHE_MAXSIZE = 256
+
 class StageCompletion:
     """
     Handles the completion stage of the sprint planning workflow.
@@ -36,6 +42,9 @@ class StageCompletion:
         # populated by load_and_sync_team_members()
         self.members: List[User] = []
 
+        # session_id -> (loaded_at, documents), see get_all_documents_by_session_id()
+        self._documents_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+
     # ─────────────────────────────────────────
     # Users
     # ─────────────────────────────────────────
@@ -94,39 +103,75 @@ class StageCompletion:
     # ─────────────────────────────────────────
 
     def get_all_documents_by_session_id(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the session's documents, reusing a result fetched within the last
+        DOCUMENTS_CACHE_TTL_SECONDS (see invalidate_documents_cache).
+        """
+        now = time_module.monotonic()
+        entry = self._documents_cache.get(session_id)
+        if entry is not None and now - entry[0] < DOCUMENTS_CACHE_TTL_SECONDS:
+            logger.debug(f"Using cached documents for session_id: {session_id}")
+            return entry[1]
+
         try:
             documents = self.db.get_documents_by_session_id(
                 session_id=session_id,
                 include_trashed=False,
             )
             logger.info(f"Retrieved {len(documents)} documents for session_id: {session_id}")
-            return documents
         except Exception as e:
             logger.error(f"Failed to get documents for session_id {session_id}: {e}")
             raise
 
+        # Drop expired entries, then the oldest ones if the cache is still full
+        for cached_session_id, (loaded_at, _) in list(self._documents_cache.items()):
+            if now - loaded_at >= DOCUMENTS_CACHE_TTL_SECONDS:
+                self._documents_cache.pop(cached_session_id, None)
+        while len(self._documents_cache) >= DOCUMENTS_CACHE_MAXSIZE:
+            self._documents_cache.pop(next(iter(self._documents_cache)), None)
+        self._documents_cache[session_id] = (now, documents)
+        return documents
+
+    def invalidate_documents_cache(self, session_id: str) -> None:
+        """Drop the cached documents of a session (call after changing them)."""
+        self._documents_cache.pop(session_id, None)
+
     def update_documents_project_id(
         self,
         documents: List[Dict[str, Any]],
         project_id: str,
     ) -> List[Dict[str, Any]]:
-        updated_documents = []
-
+        document_ids = []
         for doc in documents:
             document_id = doc.get("id")
             if not document_id:
                 logger.warning(f"Skipping document without ID: {doc}")
                 continue
+            document_ids.append(document_id)
 
-            try:
-                updated_doc = self.db.update_document(
-                    document_id=document_id,
+        # Each attempt runs in its own (nested) transaction, so a failure inside an
+        # enclosing transaction is rolled back on its own
+        try:
+            # One UPDATE for all documents
+            with self.db.transaction():
+                updated_documents = self.db.update_documents_project_id(
+                    document_ids=document_ids,
                     project_id=project_id,
                 )
-                updated_documents.append(updated_doc)
-            except Exception as e:
-                logger.error(f"Failed to update document {document_id}: {e}")
-                continue
+        except Exception as e:
+            logger.error(f"Failed to update documents in bulk, updating one by one: {e}")
+            updated_documents = []
+            for document_id in document_ids:
+                try:
+                    with self.db.transaction():
+                        updated_doc = self.db.update_document(
+                            document_id=document_id,
+                            project_id=project_id,
+                        )
+                    updated_documents.append(updated_doc)
+                except Exception as e:
+                    logger.error(f"Failed to update document {document_id}: {e}")
+                    continue
 
         logger.info(f"Updated {len(updated_documents)} documents with project_id: {project_id}")
         return updated_documents
@@ -160,6 +205,41 @@ class StageCompletion:
     # Tasks
     # ─────────────────────────────────────────
 
+    def _create_tasks_bulk(
+        self,
+        tasks: List[Dict[str, Any]],
+        project_id: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert tasks (create_task keyword arguments) with one INSERT.
+        If that fails, insert them one by one so a single bad task doesn't drop the rest;
+        each attempt runs in its own (nested) transaction.
+        """
+        if not tasks:
+            return []
+
+        try:
+            with self.db.transaction():
+                rows = self.db.create_tasks(tasks)
+        except Exception as e:
+            logger.error(
+                f"Bulk insert of {len(tasks)} tasks failed for project {project_id}, inserting one by one: {e}"
+            )
+        else:
+            return rows
+
+        rows = []
+        for task in tasks:
+            try:
+                with self.db.transaction():
+                    rows.append(self.db.create_task(**task))
+            except Exception as e:
+                logger.error(
+                    f"Failed to create task '{task['title']}' for sprint week {task['sprint_week']}: {e}"
+                )
+                continue
+        return rows
+
     def save_sprint_weeks_to_db(
         self,
         sprint_weeks: List["SprintWeek"],
@@ -178,9 +258,8 @@ class StageCompletion:
         - description left None
         - creates sub_tasks as child tasks (parent_task_id = parent id)
         - guards invalid UUIDs for assignee_id / reporter_id
+        - parent tasks are inserted with one INSERT, then all sub tasks with another
         """
-        created_tasks: List[Dict[str, Any]] = []
-
         if base_date is None:
             base_date = datetime.now(timezone.utc)
         elif base_date.tzinfo is None:
@@ -192,6 +271,10 @@ class StageCompletion:
         project_prefix = project_id[:8].upper() if len(project_id) >= 8 else project_id.upper()
         task_counter = 0
 
+        parent_tasks: List[Dict[str, Any]] = []
+        # parent key -> its sub tasks (parent_task_id is set once the parent exists)
+        sub_tasks_by_parent: Dict[str, List[Dict[str, Any]]] = {}
+
         for sprint_week in sprint_weeks:
             week_number = sprint_week.week
             week_start_dt = self._compute_week_start_date(
@@ -210,36 +293,27 @@ class StageCompletion:
                 duration_days = getattr(task, "timeline_days", 0.0) or 0.0
                 due_date = week_start_dt + timedelta(days=float(duration_days))
 
-                try:
-                    parent_row = self.db.create_task(
-                        project_id=project_id,
-                        key=parent_key,
-                        title=task.title,
-                        sprint_week=week_number,
-                        tags=[],
-                        description=None,
-                        ai_description=task.description,
-                        generated_by="ai",
-                        status="todo",
-                        priority=task.priority,
-                        assignee_id=safe_assignee_id,
-                        reporter_id=safe_reporter_id,
-                        parent_task_id=None,
-                        timeline_days=float(duration_days),
-                        start_date=week_start_dt,
-                        due_date=due_date,
-                    )
-                    created_tasks.append(parent_row)
-                except Exception as e:
-                    logger.error(
-                        f"Failed to create task '{task.title}' for sprint week {week_number}: {e}"
-                    )
-                    continue
-
-                parent_id = safe_uuid_or_none(str(parent_row.get("id")))
-
-                sub_tasks = getattr(task, "sub_tasks", None) or []
-                for sub_title in sub_tasks:
+                parent_tasks.append({
+                    "project_id": project_id,
+                    "key": parent_key,
+                    "title": task.title,
+                    "sprint_week": week_number,
+                    "tags": [],
+                    "description": None,
+                    "ai_description": task.description,
+                    "generated_by": "ai",
+                    "status": "todo",
+                    "priority": task.priority,
+                    "assignee_id": safe_assignee_id,
+                    "reporter_id": safe_reporter_id,
+                    "parent_task_id": None,
+                    "timeline_days": float(duration_days),
+                    "start_date": week_start_dt,
+                    "due_date": due_date,
+                })
+
+                sub_tasks = sub_tasks_by_parent[parent_key] = []
+                for sub_title in getattr(task, "sub_tasks", None) or []:
                     if not sub_title or not str(sub_title).strip():
                         continue
 
@@ -247,32 +321,35 @@ class StageCompletion:
                     # Include project prefix to ensure uniqueness across projects
                     sub_key = f"{project_prefix}-SP-{task_counter}"
 
-                    try:
-                        child_row = self.db.create_task(
-                            project_id=project_id,
-                            key=sub_key,
-                            title=str(sub_title).strip(),
-                            sprint_week=week_number,
-                            tags=["subtask"],
-                            description=None,
-                            ai_description=f"Subtask of '{task.title}': {str(sub_title).strip()}",
-                            generated_by="ai",
-                            status="todo",
-                            priority=task.priority,
-                            assignee_id=safe_assignee_id,
-                            reporter_id=safe_reporter_id,
-                            parent_task_id=parent_id,
-                            timeline_days=float(duration_days),
-                            start_date=week_start_dt,
-                            due_date=due_date,
-                        )
-                        created_tasks.append(child_row)
-                    except Exception as e:
-                        logger.error(
-                            f"Failed to create subtask '{sub_title}' for parent '{task.title}' "
-                            f"(week {week_number}): {e}"
-                        )
-                        continue
+                    sub_tasks.append({
+                        "project_id": project_id,
+                        "key": sub_key,
+                        "title": str(sub_title).strip(),
+                        "sprint_week": week_number,
+                        "tags": ["subtask"],
+                        "description": None,
+                        "ai_description": f"Subtask of '{task.title}': {str(sub_title).strip()}",
+                        "generated_by": "ai",
+                        "status": "todo",
+                        "priority": task.priority,
+                        "assignee_id": safe_assignee_id,
+                        "reporter_id": safe_reporter_id,
+                        "timeline_days": float(duration_days),
+                        "start_date": week_start_dt,
+                        "due_date": due_date,
+                    })
+
+        created_tasks = self._create_tasks_bulk(parent_tasks, project_id)
+
+        # Sub tasks of parents that couldn't be created are skipped
+        child_tasks: List[Dict[str, Any]] = []
+        for parent_row in created_tasks:
+            parent_id = safe_uuid_or_none(str(parent_row.get("id")))
+            for sub_task in sub_tasks_by_parent.get(parent_row.get("key"), []):
+                sub_task["parent_task_id"] = parent_id
+                child_tasks.append(sub_task)
+
+        created_tasks += self._create_tasks_bulk(child_tasks, project_id)
 
         logger.info(
             f"Created {len(created_tasks)} tasks (including subtasks) "
@@ -711,6 +788,49 @@ class StageCompletion:
     # Orchestrator
     # ─────────────────────────────────────────
 
+    def _save_project_records(
+        self,
+        *,
+        global_idea_state: GlobalIdeaState,
+        lead_user_id: str,
+        team_ids: List[str],
+        documents: List[Dict[str, Any]],
+        sprint_weeks: List["SprintWeek"],
+    ) -> Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Create the project, link the session's documents to it and save the sprint tasks
+        in one transaction: if any step fails, all of them are rolled back.
+        Blocking - complete_stage runs it in a worker thread.
+        Returns (project_id, updated documents, created tasks).
+        """
+        with self.db.transaction():
+            # Step 4: Create Project (requires team members)
+            project_id = self.create_project(
+                idea_title=global_idea_state.idea_title,
+                idea_summary_short=global_idea_state.idea_summary_short,
+                lead_user_id=lead_user_id,
+                team_ids=team_ids,
+            )
+
+            # Step 5: Update documents with project_id (requires project_id)
+            updated_documents = []
+            if documents:
+                updated_documents = self.update_documents_project_id(
+                    documents=documents,
+                    project_id=project_id,
+                )
+
+            # Step 6: Save sprint tasks with dates (requires sprint plan and project_id)
+            created_tasks = self.save_sprint_weeks_to_db(
+                sprint_weeks=sprint_weeks,
+                project_id=project_id,
+                reporter_id=lead_user_id,
+                base_date=datetime.now(timezone.utc),
+                today_completed=False,
+            )
+
+        return project_id, updated_documents, created_tasks
+
     async def complete_stage(
         self,
         global_idea_state: GlobalIdeaState,
@@ -754,7 +874,8 @@ class StageCompletion:
             if not resolved_user_id and global_idea_state.user_preferences and global_idea_state.user_preferences.user_email:
                 logger.info(f"Attempting to get/create user from email: {global_idea_state.user_preferences.user_email}")
                 try:
-                    user_dict = self.db.get_or_create_user_by_email(
+                    user_dict = await asyncio.to_thread(
+                        self.db.get_or_create_user_by_email,
                         email=global_idea_state.user_preferences.user_email,
                         name=global_idea_state.user_preferences.user_name,
                         clerk_id=global_idea_state.user_preferences.user_id or "user_invited",
@@ -788,7 +909,7 @@ class StageCompletion:
 
             # Fetch the user from database if we don't already have it
             if not lead_user:
-                lead_user = self.get_user_from_db(user_id=resolved_user_id)
+                lead_user = await asyncio.to_thread(self.get_user_from_db, user_id=resolved_user_id)
                 if not lead_user:
                     error_msg = f"Lead user not found in DB with clerk_id: {resolved_user_id}"
                     logger.error(error_msg)
@@ -806,58 +927,54 @@ class StageCompletion:
             
             # Step 1: Load & sync team members (needed before creating project)
             yield Event(event_type="team_members_synced", event_status="started")
-            members, updated_team = self.load_and_sync_team_members(global_idea_state)
+            members, updated_team = await asyncio.to_thread(self.load_and_sync_team_members, global_idea_state)
             logger.info(f"Team members synced: {len(members)}")
 
             # Update global_idea_state.team (preserve other keys)
-            # Note: This is safe because global_idea_state is passed by value (converted to string)
-            # and we're working with a local copy in this method
+            # GlobalIdeaState is frozen - rebind to an updated copy local to this method
             if updated_team:
-                global_idea_state.team = updated_team
+                global_idea_state = global_idea_state.model_copy(update={"team": updated_team})
             yield Event(event_type="team_members_synced", event_status="completed")
 
-            # Step 2: Create Project (requires team members)
+            # Step 2: Generate full 4-week sprint (only needs the idea state, so the slow
+            # LLM call runs before the transaction below instead of holding it open)
             if not global_idea_state.idea_title:
                 raise ValueError("idea_title is required to create a project")
 
+            # Events keep their original order (project, sources, sprint plan) even though
+            # the work below runs concurrently and is committed in one transaction
             yield Event(event_type="project_created", event_status="started")
-            project_id = self.create_project(
-                idea_title=global_idea_state.idea_title,
-                idea_summary_short=global_idea_state.idea_summary_short,
+            # Step 3: Get all documents by session_id - independent of the sprint plan,
+            # so the query runs while the agent is generating
+            sprint_state, documents = await asyncio.gather(
+                self.sprint_planner_agent.agenerate_all_weeks_sprint(
+                    idea_context=str(global_idea_state)
+                ),
+                asyncio.to_thread(self.get_all_documents_by_session_id, session_id),
+            )
+
+            # Steps 4-6: project, document links and tasks, written in one transaction on a
+            # worker thread; progress events are sent once it has committed
+            project_id, updated_documents, created_tasks = await asyncio.to_thread(
+                self._save_project_records,
+                global_idea_state=global_idea_state,
                 lead_user_id=lead_user_db_id,
                 team_ids=[member.id for member in members],
+                documents=documents,
+                sprint_weeks=sprint_state.sprints,
             )
-            results["project_id"] = project_id
             yield Event(event_type="project_created", event_status="completed")
 
-            # Step 3: Get all documents by session_id
-            documents = self.get_all_documents_by_session_id(session_id)
-
-            # Step 4: Update documents with project_id (requires project_id)
             if documents:
                 yield Event(event_type="sources_updated", event_status="started")
-                updated_documents = self.update_documents_project_id(
-                    documents=documents,
-                    project_id=project_id,
-                )
                 results["documents_updated"] = len(updated_documents)
                 yield Event(event_type="sources_updated", event_status="completed")
 
-            # Step 5: Generate full 4-week sprint
-            yield Event(event_type="sprint_plan_generated", event_status="started")
-            sprint_state = self.sprint_planner_agent.generate_all_weeks_sprint(
-                idea_context=str(global_idea_state)
-            )
-
-            # Step 6: Save sprint tasks with dates (requires sprint plan and project_id)
-            created_tasks = self.save_sprint_weeks_to_db(
-                sprint_weeks=sprint_state.sprints,
-                project_id=project_id,
-                reporter_id=lead_user_db_id,
-                base_date=datetime.now(timezone.utc),
-                today_completed=False,
-            )
+            # The documents now carry the project_id; a rolled back transaction leaves them unchanged
+            self.invalidate_documents_cache(session_id)
+            results["project_id"] = project_id
             results["tasks_created"] = len(created_tasks)
+            yield Event(event_type="sprint_plan_generated", event_status="started")
             yield Event(event_type="sprint_plan_generated", event_status="completed")
 
             # Step 7: Start narrative sections generation in background (non-blocking)
@@ -7,7 +7,7 @@ import logging
 from typing import AsyncGenerator
 from src.models.chat_transfer_model import ChatResponse, ChatRequest
 from src.handlers.message_storage import (
-    save_user_message,
+    build_user_message,
     fetch_session_messages,
     get_last_stage_messages
 )
@@ -43,23 +43,36 @@ async def stream_generator(chat_request: ChatRequest, workflow, db=None) -> Asyn
             
             # Add user preferences to the global state if provided
             if chat_request.user_preferences:
-                global_state.user_preferences = chat_request.user_preferences
+                global_state = global_state.model_copy(update={"user_preferences": chat_request.user_preferences})
             
             # Thread-safe update: replace the entire global state atomically
-            workflow.set_global_idea_state(global_state)
+            workflow.set_global_idea_state(chat_request.session_id, global_state)
             
             
             if initial_response:
                 yield f"{initial_response.model_dump_json()}\n"
-                logger.info(f"Sent messages for session {chat_request.session_id}")
+                logger.info("Sent messages for session %s", chat_request.session_id)
         
         # Save user message to database (always save if there's a user message)
         if chat_request.user_message and chat_request.connection_status == "active":
+            # Rebuild the session's idea state from the DB if it is not held in memory
+            # (e.g. the process restarted or the session was evicted). This loads the whole
+            # session, which the last stage lookup below then reuses.
+            if not workflow.has_session_state(chat_request.session_id):
+                _, global_state = await fetch_session_messages(
+                    chat_request.session_id,
+                    db,
+                    chat_request.idea_state_stage,
+                )
+                workflow.set_global_idea_state(chat_request.session_id, global_state)
+            
             messages, last_stage = await get_last_stage_messages(chat_request.session_id, db)
             
             # Thread-safe update: add user preferences to the global state if provided
             if chat_request.user_preferences:
-                workflow.update_global_idea_state_field("user_preferences", chat_request.user_preferences)
+                workflow.update_global_idea_state_field(
+                    chat_request.session_id, "user_preferences", chat_request.user_preferences
+                )
             
             # Ensure last_stage is a valid integer, default to 1 if None
             if last_stage is None or not isinstance(last_stage, int) or last_stage < 1:
@@ -69,23 +82,25 @@ async def stream_generator(chat_request: ChatRequest, workflow, db=None) -> Asyn
                 yield f"{ChatResponse(connection_status='events_completed', idea_state_stage=9, response_content='All stages completed. Project created successfully.').model_dump_json()}\n"
                 return
                 
+            # The user message is saved by the workflow together with the agent reply
+            pending_user_message = None
             if last_stage <= 8:
-                await save_user_message(chat_request, db, last_stage)
+                pending_user_message = build_user_message(chat_request, last_stage)
                 # add this last user message to the messages list
                 messages.append(HumanMessage(content=chat_request.user_message))
             
             # Execute the workflow and stream responses (including events)
             # This handles both stages 1-8 and stage 9 (direct stage completion)
-            async for response in workflow.execute(messages, last_stage, chat_request.session_id, chat_request.user_id, db, chat_request.user_preferences):
+            async for response in workflow.execute(messages, last_stage, chat_request.session_id, chat_request.user_id, db, chat_request.user_preferences, pending_user_message):
                 yield f"{response.model_dump_json()}\n"
         
         elif chat_request.connection_status == "active" and not chat_request.user_message:
-            logger.warning(f"User message is required.")
+            logger.warning("User message is required.")
             error_response = ChatResponse(connection_status="error", error_message="User message is required.")
             yield f"{error_response.model_dump_json()}\n"
         
     except Exception as e:
-        logger.error(f"Error in stream_generator: {e}", exc_info=True)
+        logger.error("Error in stream_generator: %s", e, exc_info=True)
         error_response = ChatResponse(connection_status="error", error_message=f"Error: {str(e)}")
         yield f"{error_response.model_dump_json()}\n"
 
@@ -3,8 +3,10 @@ from typing import Optional, Dict, Any
 from datetime import datetime
 import uuid
 
+from src.utils.uuid_pool import UUID_POOL
+
 class ChatMessageModel(BaseModel):
-    chat_id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    chat_id: uuid.UUID = Field(default_factory=UUID_POOL.next)
     session_id: str
     user_id: Optional[str] = None
     role: str
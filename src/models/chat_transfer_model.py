@@ -1,7 +1,11 @@
 from typing import Optional, List, Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 class UserPreferences(BaseModel):
     """User preferences associated with the request."""
+
+    # Read-only once parsed from the request; frozen also makes it hashable
+    model_config = ConfigDict(frozen=True)
+
     user_id: Optional[str] = Field(
         default=None,
         description="Optional user ID associated with the request."
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 
 # Import nested models from other states
@@ -9,7 +9,10 @@ class GlobalIdeaState(BaseModel):
     """
     Global state that aggregates all agent states.
     Contains all fields from all agent states in the workflow.
+    Frozen: derive updated states with model_copy(update=...) so instances can be shared.
     """
+
+    model_config = ConfigDict(frozen=True)
     
     # ========== Idea Evaluation Agent Fields ==========
     idea_title: Optional[str] = None
@@ -0,0 +1,83 @@
+import asyncio
+
+from src.handlers.message_writer import MessageWriter
+from src.models.chat_message_model import ChatMessageModel
+
+
+class FakeDB:
+    """Records inserted batches; any batch containing a "bad" message fails."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def insert_chat_messages_async(self, msgs):
+        await asyncio.sleep(0)
+        if any(msg.content == "bad" for msg in msgs):
+            raise ValueError("bad row")
+        self.batches.append([msg.content for msg in msgs])
+
+    @property
+    def saved(self):
+        return [content for batch in self.batches for content in batch]
+
+
+def _message(session_id, content):
+    return ChatMessageModel(session_id=session_id, role="user", content=content, stage=1)
+
+
+def test_writes_of_a_session_are_saved_in_order():
+    async def scenario():
+        db = FakeDB()
+        writer = MessageWriter(num_workers=4, batch_size=3, flush_interval_ms=1)
+        futures = []
+        for i in range(20):
+            for session_id in ("s1", "s2", "s3"):
+                futures.append(await writer.submit(db, [_message(session_id, f"{session_id}-{i}")]))
+            await asyncio.sleep(0)
+        assert all(await asyncio.gather(*futures))
+        await writer.close()
+        return db
+
+    db = asyncio.run(scenario())
+    for session_id in ("s1", "s2", "s3"):
+        saved = [content for content in db.saved if content.startswith(session_id + "-")]
+        assert saved == [f"{session_id}-{i}" for i in range(20)]
+
+
+def test_failed_batch_falls_back_to_single_writes():
+    async def scenario():
+        db = FakeDB()
+        writer = MessageWriter(num_workers=1, flush_interval_ms=50)
+        futures = [
+            await writer.submit(db, [_message("s1", content)])
+            for content in ("first", "bad", "last")
+        ]
+        results = await asyncio.gather(*futures)
+        await writer.close()
+        return db, results
+
+    db, results = asyncio.run(scenario())
+    assert results == [True, False, True]
+    assert db.batches == [["first"], ["last"]]
+
+
+def test_close_drains_queued_writes():
+    async def scenario():
+        db = FakeDB()
+        writer = MessageWriter(num_workers=2, batch_size=5, flush_interval_ms=1)
+        futures = [await writer.submit(db, [_message(f"s{i % 7}", str(i))]) for i in range(100)]
+        await writer.close()
+        return db, writer, futures
+
+    db, writer, futures = asyncio.run(scenario())
+    assert sorted(db.saved, key=int) == [str(i) for i in range(100)]
+    assert all(future.done() and future.result() for future in futures)
+    assert writer.pending == 0
+
+
+def test_empty_submit_resolves_false():
+    async def scenario():
+        writer = MessageWriter()
+        return await (await writer.submit(FakeDB(), []))
+
+    assert asyncio.run(scenario()) is False
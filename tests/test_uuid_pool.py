@@ -0,0 +1,33 @@
+import uuid
+
+from src.utils import uuid_pool
+from src.utils.uuid_pool import UUIDPool
+
+
+def test_version_and_variant_bits():
+    pool = UUIDPool(batch_size=4)
+    for _ in range(20):
+        value = pool.next()
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+
+def test_timestamp_prefix(monkeypatch):
+    monkeypatch.setattr(uuid_pool.time, "time_ns", lambda: 1_700_000_000_123_456_789)
+    value = UUIDPool().next()
+    assert value.int >> 80 == 1_700_000_000_123
+
+
+def test_ids_sort_by_creation_time(monkeypatch):
+    clock = iter(range(1_700_000_000_000, 1_700_000_000_050))
+    monkeypatch.setattr(uuid_pool.time, "time_ns", lambda: next(clock) * 1_000_000)
+    pool = UUIDPool(batch_size=8)
+    ids = [pool.next() for _ in range(50)]
+    assert ids == sorted(ids)
+    assert [str(i) for i in ids] == sorted(str(i) for i in ids)
+
+
+def test_refills_and_stays_unique():
+    pool = UUIDPool(batch_size=2)
+    ids = {pool.next() for _ in range(100)}
+    assert len(ids) == 100